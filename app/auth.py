@@ -1,6 +1,8 @@
 # app/auth.py - Using bcrypt directly
 import bcrypt
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict
 from jose import jwt, JWTError
@@ -9,7 +11,9 @@ from fastapi.security import OAuth2PasswordBearer
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.database import get_db
+from app.utils.cache import MemoryCache
 from bson import ObjectId
+from bson.errors import InvalidId
 
 load_dotenv()
 
@@ -21,11 +25,18 @@ REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
 # -------------------------------
 # Password hashing with bcrypt directly
 # -------------------------------
+# bcrypt releases the GIL, so a thread pool lets hashing scale with cores
+# while the event loop keeps serving other requests.
+PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+
+_password_executor: Optional[ThreadPoolExecutor] = None
+
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt (automatically handles 72-byte limit)"""
     # bcrypt internally handles the 72-byte limit, but we'll truncate to be safe
     password_bytes = password.encode('utf-8')[:72]
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
@@ -33,7 +44,59 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     plain_bytes = plain_password.encode('utf-8')[:72]
     hashed_bytes = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(plain_bytes, hashed_bytes)
+    try:
+        return bcrypt.checkpw(plain_bytes, hashed_bytes)
+    except ValueError:
+        # Missing or malformed stored hash
+        return False
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with a different cost than BCRYPT_ROUNDS"""
+    # bcrypt hashes look like $2b$12$<salt+hash>
+    parts = hashed_password.split("$")
+    try:
+        return int(parts[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+def _get_password_executor() -> ThreadPoolExecutor:
+    global _password_executor
+    if _password_executor is None:
+        _password_executor = ThreadPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            thread_name_prefix="bcrypt"
+        )
+    return _password_executor
+
+async def hash_password_async(password: str) -> str:
+    """hash_password on the password executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_executor(), hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_executor(), verify_password, plain_password, hashed_password)
+
+def shutdown_password_executor() -> None:
+    """Stop the password executor on shutdown"""
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False, cancel_futures=True)
+        _password_executor = None
+
+# -------------------------------
+# Principal cache
+# -------------------------------
+# Resolved users keyed by token subject. The cache is per process: role
+# changes call invalidate_user on the worker that made them, other workers
+# pick the change up within USER_CACHE_TTL_SECONDS.
+USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))
+# The password hash never leaves the database on authenticated requests
+USER_PROJECTION = {"password": 0}
+
+_user_cache = MemoryCache(max_entries=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL_SECONDS)
 
 # -------------------------------
 # JWT Tokens (unchanged)
@@ -77,10 +140,22 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = await db["users"].find_one({"_id": ObjectId(identifier)})
-    if not user:
-        raise credentials_exception
-    return user
+    user = await _user_cache.get(identifier)
+    if user is None:
+        try:
+            user_oid = ObjectId(identifier)
+        except InvalidId:
+            raise credentials_exception
+        user = await db["users"].find_one({"_id": user_oid}, USER_PROJECTION)
+        if not user:
+            raise credentials_exception
+        await _user_cache.set(identifier, user)
+    # Copy so handlers can't mutate the cached principal
+    return dict(user)
+
+async def invalidate_user(user_id) -> None:
+    """Drop a cached principal, e.g. after its role changed"""
+    await _user_cache.delete(str(user_id))
 
 def require_role(required_roles: List[str]):
     """FastAPI dependency to require a role"""
@@ -90,6 +165,34 @@ def require_role(required_roles: List[str]):
         return user
     return role_checker
 
+# -------------------------------
+# Vendor context
+# -------------------------------
+# user_id -> approved vendor _id, so vendor writes skip the vendors lookup.
+# Only approvals are cached; approve_vendor/reject_vendor invalidate.
+_vendor_cache = MemoryCache(max_entries=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL_SECONDS)
+
+async def get_vendor_context(
+    user=Depends(require_role(["vendor"])),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+) -> dict:
+    """FastAPI dependency resolving the approved vendor of the current user"""
+    user_id = str(user["_id"])
+    vendor_id = await _vendor_cache.get(user_id)
+    if vendor_id is None:
+        if db is None:
+            raise HTTPException(status_code=500, detail="Database not connected")
+        vendor = await db["vendors"].find_one({"user_id": user_id, "status": "approved"}, {"_id": 1})
+        if not vendor:
+            raise HTTPException(status_code=403, detail="Vendor not approved")
+        vendor_id = vendor["_id"]
+        await _vendor_cache.set(user_id, vendor_id)
+    return {"_id": vendor_id, "user_id": user_id, "user": user}
+
+async def invalidate_vendor_context(user_id) -> None:
+    """Drop a cached vendor context after the vendor status changed"""
+    await _vendor_cache.delete(str(user_id))
+
 def decode_access_token(token: str) -> Dict:
     """Decode JWT token payload (without FastAPI dependencies)"""
     return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
\ No newline at end of file
@@ -1,7 +1,9 @@
 # app/crud.py
 from app import schemas, auth
 from app.database import get_db
+from app.utils import inventory, rollups
 from bson import ObjectId
+from datetime import datetime
 from typing import List, Optional
 
 # -------------------------
@@ -73,17 +75,10 @@ async def list_products() -> List[dict]:
 # -------------------------
 async def create_order(customer_id: str, product_id: str, quantity: int = 1):
     db = get_db()
-    product = await db["products"].find_one({"_id": ObjectId(product_id)})
-    if not product:
-        return None, "Product not found"
-    if product["stock"] < quantity:
-        return None, "Not enough stock"
-
-    # Decrement stock
-    await db["products"].update_one(
-        {"_id": product["_id"]},
-        {"$inc": {"stock": -quantity}}
-    )
+    try:
+        product = await inventory.reserve_stock(db, product_id, quantity)
+    except inventory.StockError as e:
+        return None, str(e)
 
     vendor = await db["vendors"].find_one({"_id": ObjectId(product["vendor_id"])})
     total_price = product["price"] * quantity
@@ -94,8 +89,10 @@ async def create_order(customer_id: str, product_id: str, quantity: int = 1):
         "vendor_id": str(vendor["_id"]) if vendor else None,
         "quantity": quantity,
         "total_price": total_price,
+        "created_at": datetime.utcnow(),
         "status": "pending"
     }
     result = await db["orders"].insert_one(order_doc)
     order_doc["id"] = str(result.inserted_id)
+    await rollups.record_orders_placed(db, [order_doc])
     return order_doc, "Order placed successfully"
@@ -1,14 +1,56 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 import os
+import asyncio
+import logging
 from dotenv import load_dotenv
 from typing import AsyncGenerator
+from app.indexes import ensure_indexes, verify_index_coverage
+from app.utils.mongo_pool import available_compressors, pool_telemetry
+from app.utils.metrics import mongo_command_metrics
+from app.utils.db_monitor import db_command_monitor
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 MONGO_URL = os.getenv("MONGO_URL")
 if not MONGO_URL:
     raise RuntimeError("MONGO_URL missing in environment")
 
+# Create registered indexes and check query coverage on startup
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "true").lower() in ("1", "true", "yes")
+
+def _optional_int(name: str) -> int | None:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+# Connection pool settings (driver defaults apply when unset)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = _optional_int("MONGO_MAX_IDLE_TIME_MS")
+MONGO_WAIT_QUEUE_TIMEOUT_MS = _optional_int("MONGO_WAIT_QUEUE_TIMEOUT_MS")
+MONGO_CONNECT_TIMEOUT_MS = _optional_int("MONGO_CONNECT_TIMEOUT_MS")
+MONGO_SOCKET_TIMEOUT_MS = _optional_int("MONGO_SOCKET_TIMEOUT_MS")
+MONGO_SERVER_SELECTION_TIMEOUT_MS = _optional_int("MONGO_SERVER_SELECTION_TIMEOUT_MS")
+# Preferred wire compressors; ones whose library is missing are skipped
+MONGO_COMPRESSORS = available_compressors(os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib"))
+
+def client_options() -> dict:
+    """Keyword arguments for AsyncIOMotorClient built from the settings above"""
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "compressors": ",".join(MONGO_COMPRESSORS) or None,
+    }
+    options = {k: v for k, v in options.items() if v is not None}
+    options["event_listeners"] = [pool_telemetry, mongo_command_metrics, db_command_monitor]
+    return options
+
 client: AsyncIOMotorClient | None = None
 db: AsyncIOMotorDatabase | None = None
 
@@ -16,19 +58,40 @@ async def connect_db() -> None:
     """Connect to MongoDB on startup"""
     global client, db
     try:
-        client = AsyncIOMotorClient(MONGO_URL)
+        client = AsyncIOMotorClient(MONGO_URL, **client_options())
         db = client["virtual_store"]
         await db.command("ping")
-        print("MongoDB connected ✅")
+        logger.info("MongoDB connected")
+        # Open the minimum pool up front instead of on the first requests
+        if MONGO_MIN_POOL_SIZE > 1:
+            await asyncio.gather(*[db.command("ping") for _ in range(MONGO_MIN_POOL_SIZE)])
     except Exception as e:
         raise RuntimeError(f"MongoDB connection failed: {e}")
 
+    if MONGO_ENSURE_INDEXES:
+        failed = await ensure_indexes(db)
+        uncovered = await verify_index_coverage(db)
+        logger.info(f"MongoDB indexes ensured (failed: {len(failed)}, uncovered query shapes: {len(uncovered)})")
+
 async def close_db() -> None:
     """Close MongoDB connection"""
     global client
     if client is not None:  # FIXED: Changed from "if client:"
         client.close()
-        print("MongoDB connection closed ✅")
+        logger.info("MongoDB connection closed")
+
+def get_pool_stats() -> dict:
+    """Pool configuration and live checkout counters"""
+    return {
+        "config": {
+            "max_pool_size": MONGO_MAX_POOL_SIZE,
+            "min_pool_size": MONGO_MIN_POOL_SIZE,
+            "max_idle_time_ms": MONGO_MAX_IDLE_TIME_MS,
+            "wait_queue_timeout_ms": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            "compressors": MONGO_COMPRESSORS,
+        },
+        "pool": pool_telemetry.snapshot(),
+    }
 
 # FastAPI dependency
 async def get_db() -> AsyncGenerator[AsyncIOMotorDatabase, None]:
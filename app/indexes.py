@@ -0,0 +1,150 @@
+# app/indexes.py
+import logging
+from datetime import datetime
+from typing import Dict, List, Tuple
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.utils.idempotency import IDEMPOTENCY_COLLECTION, IDEMPOTENCY_TTL_SECONDS
+from app.utils.notifications import (
+    NOTIFY_DEAD_RETENTION_SECONDS,
+    NOTIFY_SENT_RETENTION_SECONDS,
+    OUTBOX_COLLECTION,
+    STATUS_DEAD,
+    STATUS_SENT,
+)
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Index registry
+# -------------------------
+# Every index the application relies on, per collection. Names are fixed so
+# ensure_indexes is idempotent across restarts and deployments.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "vendors": [
+        # Also serves lookups on user_id alone (prefix)
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING)], name="user_id_status"),
+        IndexModel([("status", ASCENDING)], name="status"),
+    ],
+    "products": [
+        IndexModel([("vendor_id", ASCENDING), ("_id", DESCENDING)], name="vendor_id_id"),
+        # Catalog listing sorted by price, optionally within one vendor
+        IndexModel([("price", ASCENDING), ("_id", ASCENDING)], name="price_id"),
+        IndexModel([("vendor_id", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)], name="vendor_id_price_id"),
+        IndexModel(
+            [("name", TEXT), ("description", TEXT)],
+            name="name_description_text",
+            weights={"name": 10, "description": 2}
+        ),
+    ],
+    "orders": [
+        # Vendor order dashboard, newest first; _id breaks ties for keyset paging
+        IndexModel(
+            [("vendor_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="vendor_id_created_at_id"
+        ),
+    ],
+    "upi_orders": [
+        IndexModel([("upi_order_id", ASCENDING)], name="upi_order_id_unique", unique=True),
+        IndexModel([("order_id", ASCENDING)], name="order_id"),
+        IndexModel([("customer_id", ASCENDING), ("created_at", DESCENDING)], name="customer_id_created_at"),
+    ],
+    "daily_sales": [
+        # One bucket per vendor and day; $merge in the rollup rebuild requires it
+        IndexModel([("vendor_id", ASCENDING), ("day", ASCENDING)], name="vendor_id_day_unique", unique=True),
+        IndexModel([("day", ASCENDING)], name="day"),
+    ],
+    IDEMPOTENCY_COLLECTION: [
+        # Keys expire on their own; lookups go by _id
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS),
+    ],
+    OUTBOX_COLLECTION: [
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        # Finished messages expire; pending ones never have sent_at/dead_at
+        IndexModel(
+            [("sent_at", ASCENDING)], name="sent_at_ttl",
+            expireAfterSeconds=NOTIFY_SENT_RETENTION_SECONDS, partialFilterExpression={"status": STATUS_SENT}
+        ),
+        IndexModel(
+            [("dead_at", ASCENDING)], name="dead_at_ttl",
+            expireAfterSeconds=NOTIFY_DEAD_RETENTION_SECONDS, partialFilterExpression={"status": STATUS_DEAD}
+        ),
+    ],
+}
+
+# Hot query shapes as (collection, filter, sort). Values are placeholders:
+# only the shape matters to the planner.
+QUERY_SHAPES: List[Tuple[str, dict, list]] = [
+    ("users", {"email": ""}, []),
+    ("vendors", {"user_id": ""}, []),
+    ("vendors", {"user_id": "", "status": "approved"}, []),
+    ("vendors", {"status": "approved"}, []),
+    ("products", {"vendor_id": ObjectId()}, [("_id", DESCENDING)]),
+    ("products", {"price": {"$gte": 0, "$lte": 0}}, [("price", ASCENDING), ("_id", ASCENDING)]),
+    ("products", {"vendor_id": ObjectId(), "price": {"$gte": 0}}, [("price", DESCENDING), ("_id", DESCENDING)]),
+    ("orders", {"vendor_id": "", "status": "pending"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("upi_orders", {"order_id": ""}, []),
+    ("upi_orders", {"customer_id": ObjectId()}, [("created_at", DESCENDING)]),
+    ("daily_sales", {"vendor_id": "", "day": {"$gte": datetime.utcnow(), "$lt": datetime.utcnow()}}, [("day", ASCENDING)]),
+    ("daily_sales", {"day": {"$gte": datetime.utcnow(), "$lt": datetime.utcnow()}}, []),
+    ("notification_outbox", {"status": "pending", "next_attempt_at": {"$lte": datetime.utcnow()}}, [("next_attempt_at", ASCENDING)]),
+]
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> List[str]:
+    """
+    Create every registered index that does not exist yet.
+
+    Indexes are created one by one so a single failure (e.g. duplicate
+    emails blocking the unique index) is logged without hiding the rest or
+    stopping startup. Returns the names of indexes that could not be built.
+    """
+    failed = []
+    for collection, models in INDEXES.items():
+        for model in models:
+            name = model.document["name"]
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as e:
+                failed.append(f"{collection}.{name}")
+                logger.error(f"Could not create index {collection}.{name}: {e}")
+    return failed
+
+
+def _plan_stages(plan: dict):
+    """Yield every stage name in an explain() plan tree"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def verify_index_coverage(db: AsyncIOMotorDatabase) -> List[str]:
+    """Explain each registered query shape and log the ones that scan a whole collection"""
+    uncovered = []
+    for collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explain = await cursor.explain()
+        except Exception as e:
+            logger.warning(f"Could not explain {collection} {query}: {e}")
+            continue
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in set(_plan_stages(winning_plan)):
+            shape = f"{collection} filter={sorted(query)} sort={sort}"
+            uncovered.append(shape)
+            logger.warning(f"Query shape without index coverage: {shape}")
+    return uncovered
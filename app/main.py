@@ -1,15 +1,28 @@
 import os
 import sys
-import traceback
-from fastapi import FastAPI, Request
+import logging
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 from datetime import datetime
 
-from app.database import connect_db, close_db
-from app.routers import users, store, payment  # FIX: Added payment router
+# Configure logging before the app modules, some of which log at import time
+from app.utils.log import RequestIdMiddleware, setup_logging, shutdown_logging
+setup_logging()
 
+from app import database
+from app.database import connect_db, close_db, get_pool_stats
+from app.utils.cache import check_cache_backend, close_cache
+from app.utils.ratelimit import RateLimitMiddleware, close_rate_limiter
+from app.utils.db_monitor import DB_COMMANDS_HEADER, DB_STATS_HEADERS, DB_TIME_HEADER, DbStatsMiddleware
+from app.utils.metrics import MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, render_metrics
+from app.utils.cloudinary_utils import shutdown_upload_executor
+from app.auth import shutdown_password_executor
+from app.utils.notifications import start_notification_workers, stop_notification_workers
+from app.routers import users, store, payment, analytics  # FIX: Added payment router
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Virtual Store Backend")
 
@@ -61,12 +74,20 @@ async def debug_versions():
     }
 
 
+# Innermost: counts the MongoDB commands each request issues
+app.add_middleware(DbStatsMiddleware)
+
+# Rate limiting runs inside CORS so 429 responses still carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],   # ✔ FIXED
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After", "X-Request-ID"]
+    + ([DB_COMMANDS_HEADER, DB_TIME_HEADER] if DB_STATS_HEADERS else []),
 )
 
 
@@ -76,21 +97,27 @@ async def catch_exceptions_middleware(request: Request, call_next):
     try:
         return await call_next(request)
     except Exception as e:
-        print("=" * 80)
-        print("FULL ERROR TRACEBACK:")
-        print(traceback.format_exc())
-        print("=" * 80)
-        print(f"Request: {request.method} {request.url}")
+        logger.exception(f"Unhandled error on {request.method} {request.url.path}")
         return JSONResponse(
             status_code=500,
             content={"detail": f"Internal server error: {str(e)}"}
         )
 
 
+# Middleware order, outermost first (each add_middleware wraps the ones before):
+# RequestId -> Metrics -> error handler -> CORS -> RateLimit -> DbStats.
+# Metrics wraps the error handler, so rejected and failed requests are counted too
+app.add_middleware(MetricsMiddleware, router_app=app)
+
+# Outermost: the request ID is set before anything else runs, so every log line of a request carries it
+app.add_middleware(RequestIdMiddleware)
+
+
 # Routers
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(store.router, prefix="/api/store", tags=["Store"])
 app.include_router(payment.router, prefix="/api/payments", tags=["Payments"])   # FIX ADDED
+app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
 
 
 # Serve uploads
@@ -110,13 +137,22 @@ async def root():
 @app.on_event("startup")
 async def startup_event():
     await connect_db()
-    print("Database connected ✅")
+    logger.info("Database connected")
+    check_cache_backend()
+    await start_notification_workers(database.db)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await stop_notification_workers()
     await close_db()
-    print("Database disconnected ✅")
+    await close_cache()
+    await close_rate_limiter()
+    shutdown_upload_executor()
+    shutdown_password_executor()
+    logger.info("Database disconnected")
+    shutdown_logging()
+
 @app.get("/health")
 async def health_check():
     return JSONResponse(
@@ -127,6 +163,23 @@ async def health_check():
         }
     )
 
+def monitoring_authorized(request: Request) -> bool:
+    # Optional shared secret for scrapers: METRICS_TOKEN=<token>, sent as a bearer token
+    token = os.getenv("METRICS_TOKEN")
+    return not token or request.headers.get("authorization") == f"Bearer {token}"
+
+@app.get("/health/db")
+async def db_pool_health(request: Request):
+    if not monitoring_authorized(request):
+        return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
+    return get_pool_stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if not monitoring_authorized(request):
+        return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
+    return Response(content=render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
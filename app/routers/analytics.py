@@ -0,0 +1,156 @@
+# app/routers/analytics.py
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import List, Optional, Tuple
+from datetime import date, datetime, time, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+import os
+
+from app.database import get_db
+from app import schemas, auth
+from app.utils.rollups import DAILY_SALES_COLLECTION, rebuild_daily_sales
+
+router = APIRouter()
+
+# Every endpoint here reads the precomputed daily_sales buckets only, never
+# `orders`, so the cost depends on the number of days asked for.
+ANALYTICS_DEFAULT_DAYS = int(os.getenv("ANALYTICS_DEFAULT_DAYS", 30))
+ANALYTICS_MAX_DAYS = int(os.getenv("ANALYTICS_MAX_DAYS", 366))
+
+SALES_FIELDS = ("orders", "units", "revenue", "paid_orders", "paid_revenue")
+
+
+def day_range(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    """Resolve the requested [start, end] days, defaulting to the last ANALYTICS_DEFAULT_DAYS"""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days + 1 > ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {ANALYTICS_MAX_DAYS} days")
+    return start, end
+
+
+def day_filter(start: date, end: date) -> dict:
+    return {"$gte": datetime.combine(start, time.min), "$lt": datetime.combine(end + timedelta(days=1), time.min)}
+
+
+def sum_fields() -> dict:
+    return {field: {"$sum": f"${field}"} for field in SALES_FIELDS}
+
+
+def fill_days(rows: List[dict], start: date, end: date, vendor_id: Optional[str] = None) -> List[dict]:
+    """One row per day in the range, with zeros for days without sales"""
+    by_day = {row["day"].date(): row for row in rows}
+    days = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        row = by_day.get(day, {})
+        days.append({
+            "day": day,
+            "vendor_id": vendor_id,
+            **{field: row.get(field, 0) for field in SALES_FIELDS}
+        })
+    return days
+
+
+# -------------------------
+# Vendor Endpoints
+# -------------------------
+@router.get("/vendors/me/daily", response_model=List[schemas.DailySalesOut])
+async def my_daily_sales(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    vendor=Depends(auth.get_vendor_context),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Daily sales of the current vendor"""
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
+    start, end = day_range(start, end)
+    vendor_id = str(vendor["_id"])
+    rows = await db[DAILY_SALES_COLLECTION].find(
+        {"vendor_id": vendor_id, "day": day_filter(start, end)},
+        {"_id": 0, "day": 1, **{field: 1 for field in SALES_FIELDS}}
+    ).sort("day", 1).to_list(length=None)
+    return fill_days(rows, start, end, vendor_id)
+
+
+# -------------------------
+# Admin Endpoints
+# -------------------------
+@router.get("/admin/daily", response_model=List[schemas.DailySalesOut])
+async def store_daily_sales(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    vendor_id: Optional[str] = None,
+    user=Depends(auth.require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Daily sales across all vendors, or of one vendor"""
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
+    start, end = day_range(start, end)
+    match = {"day": day_filter(start, end)}
+    if vendor_id:
+        match["vendor_id"] = vendor_id
+    rows = await db[DAILY_SALES_COLLECTION].aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$day", **sum_fields()}},
+        {"$addFields": {"day": "$_id"}},
+    ]).to_list(length=None)
+    return fill_days(rows, start, end, vendor_id)
+
+
+@router.get("/admin/vendors", response_model=List[schemas.VendorSalesOut])
+async def vendor_sales_ranking(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = Query(20, ge=1, le=200),
+    user=Depends(auth.require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Vendors ranked by revenue over the range"""
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
+    start, end = day_range(start, end)
+    rows = await db[DAILY_SALES_COLLECTION].aggregate([
+        {"$match": {"day": day_filter(start, end)}},
+        {"$group": {"_id": "$vendor_id", **sum_fields()}},
+        {"$sort": {"revenue": -1, "_id": 1}},
+        {"$limit": limit},
+    ]).to_list(length=limit)
+
+    vendor_oids = []
+    for row in rows:
+        try:
+            vendor_oids.append(ObjectId(row["_id"]))
+        except (InvalidId, TypeError):
+            pass
+    vendors = await db["vendors"].find({"_id": {"$in": vendor_oids}}, {"shop_name": 1}).to_list(length=len(vendor_oids))
+    shop_names = {str(v["_id"]): v.get("shop_name") for v in vendors}
+
+    return [
+        {"vendor_id": row["_id"], "shop_name": shop_names.get(row["_id"]), **{field: row[field] for field in SALES_FIELDS}}
+        for row in rows
+    ]
+
+
+@router.post("/admin/rebuild")
+async def rebuild_sales_rollups(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    user=Depends(auth.require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Recompute daily_sales from orders, for the whole history unless a range is given"""
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    return await rebuild_daily_sales(db, start, end)
@@ -6,6 +6,8 @@ import os
 from typing import Optional
 
 from app.database import get_db
+from app.utils.ids import new_upi_order_id
+from app.utils import rollups
 from app.schemas import (
     UPIOrderCreate, 
     PaymentConfirm, 
@@ -34,7 +36,7 @@ async def create_upi_payment(
             raise HTTPException(status_code=404, detail="Order not found")
         
         # Generate unique UPI order ID
-        upi_order_id = f"UPI{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        upi_order_id = new_upi_order_id()
         
         # Create UPI order document
         upi_order = {
@@ -95,17 +97,9 @@ async def confirm_upi_payment(
             }
         )
         
-        # Update main order payment status
-        await db.orders.update_one(
-            {"_id": ObjectId(confirm_data.order_id)},
-            {
-                "$set": {
-                    "payment_status": "paid",
-                    "status": "confirmed",
-                    "updated_at": datetime.now()
-                }
-            }
-        )
+        # Update main order payment status (a cart payment covers several orders)
+        order_oids = [ObjectId(i) for i in upi_order.get("order_ids") or [confirm_data.order_id]]
+        await rollups.mark_orders_paid(db, order_oids, datetime.now())
         
         return PaymentResponse(
             success=True,
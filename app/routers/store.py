@@ -1,25 +1,39 @@
 # app/routers/store.py
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Body, Request
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Body, Header, Request, Query, Response
+from typing import List, Literal, Optional
 from pathlib import Path
 import shutil
 import os
 import asyncio
+import logging
 from bson import ObjectId
 from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel, Field
 from app.database import get_db
+from app.utils.ids import new_upi_order_id
 from app import schemas, auth
-from app.utils.twilio_utils import send_whatsapp
+from app.utils.notifications import enqueue_whatsapp, get_outbox_stats
+from app.utils import idempotency, inventory, rollups
+from app.utils.cache import get_cache
+from app.utils.cloudinary_utils import upload_image, get_upload_stats
+from app.utils.search import product_search_index
+from app.utils.responses import render_json, json_response, make_etag, conditional_json_response
+from app.utils.streaming import StreamFormat, stream_response
+from app.utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    encode_cursor,
+    decode_cursor
+)
 from bson.errors import InvalidId
+from pymongo.errors import OperationFailure
 from fastapi import Form
 from fastapi.responses import FileResponse
 from pathlib import Path
-import cloudinary 
-import cloudinary.uploader
-import cloudinary.api
 from app.schemas import (
+    CartCheckout,
     OrderCreate, 
     OrderOut, 
     PaymentConfirm,
@@ -27,6 +41,8 @@ from app.schemas import (
     PaymentResponse
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(tags=["Store"])
 
 # -------------------------
@@ -35,45 +51,286 @@ router = APIRouter(tags=["Store"])
 UPLOAD_DIR = Path("uploads/products")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 TWILIO_WHATSAPP_ADMIN = os.getenv("TWILIO_WHATSAPP_NUMBER")
+# "mongo" uses the products text index, "memory" the in-process inverted index
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "mongo").lower()
+# Ranked ids looked up per query on the in-process path
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", 1000))
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")  # Absolute URL
+# MongoDB error code for a $text query without a text index
+INDEX_NOT_FOUND = 27
 
 
 # -------------------------
-# Cloudinary setup
+# Catalog cache
 # -------------------------
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True
-)
+# Product and vendor reads are served from the cache; every product write
+# and vendor approval/rejection bumps the catalog version (the generation
+# counter of this namespace). With CACHE_BACKEND=redis the counter is shared,
+# so no worker serves a stale page after an edit; with the per-process memory
+# backend only the worker that handled the write sees the bump, and the
+# others keep serving old pages for up to CACHE_TTL_SECONDS.
+# Stock changes from orders are not invalidated and age out with the TTL.
+CATALOG_NAMESPACE = "catalog"
+# Bump when the shape of cached catalog values changes, so a shared Redis
+# never hands new code an entry written by the previous release
+CATALOG_CACHE_FORMAT = 3
+
+async def catalog_cache_key(*parts) -> str:
+    return await get_cache().namespaced_key(CATALOG_NAMESPACE, f"v{CATALOG_CACHE_FORMAT}", *parts)
+
+async def invalidate_catalog() -> None:
+    await get_cache().invalidate(CATALOG_NAMESPACE)
+
+def catalog_entry(body: str, next_cursor: Optional[str] = None) -> dict:
+    """Cacheable catalog response: rendered body, its ETag and the next page cursor"""
+    return {"body": body, "etag": make_etag(body), "next_cursor": next_cursor}
+
+def page_response(request: Request, page: dict) -> Response:
+    """Send a cached or freshly rendered catalog entry, honouring If-None-Match"""
+    headers = {NEXT_CURSOR_HEADER: page["next_cursor"]} if page.get("next_cursor") else None
+    return conditional_json_response(request, page["body"], page["etag"], headers)
+
+# -------------------------
+# Catalog queries
+# -------------------------
+# Only the ProductOut fields are fetched from Mongo
+PRODUCT_PROJECTION = {"name": 1, "description": 1, "price": 1, "stock": 1, "image_url": 1}
+
+def render_products(docs: List[dict]) -> str:
+    """Validate raw product documents once and render them as a JSON array"""
+    products = schemas.PRODUCT_LIST_ADAPTER.validate_python(docs)
+    return render_json(schemas.PRODUCT_LIST_ADAPTER.dump_python(products))
+
+def encode_product(doc: dict) -> dict:
+    return schemas.ProductOut.model_validate(doc).model_dump()
+
+def encode_vendor(doc: dict) -> dict:
+    doc["id"] = str(doc["_id"])
+    return schemas.VendorOut.model_validate(doc).model_dump()
+
+# Sort orders for catalog listings: (sort spec, keyset field or None for _id only)
+PRODUCT_SORTS = {
+    "newest": ([("_id", -1)], None),
+    "price_asc": ([("price", 1), ("_id", 1)], "price"),
+    "price_desc": ([("price", -1), ("_id", -1)], "price"),
+}
+
+def catalog_filters(
+    vendor_id: Optional[str] = None,
+    in_stock: bool = False,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None
+) -> dict:
+    """Mongo filter for the catalog query parameters"""
+    filters = {}
+    if vendor_id:
+        try:
+            filters["vendor_id"] = ObjectId(vendor_id)
+        except InvalidId:
+            raise HTTPException(status_code=400, detail="Invalid vendor_id")
+    if in_stock:
+        filters["stock"] = {"$gt": 0}
+    price = {}
+    if min_price is not None:
+        price["$gte"] = min_price
+    if max_price is not None:
+        price["$lte"] = max_price
+    if price:
+        filters["price"] = price
+    return filters
+
+def keyset_filter(sort: str, position: dict) -> dict:
+    """Filter selecting the documents after `position` in the given sort order"""
+    spec, field = PRODUCT_SORTS[sort]
+    op = "$lt" if spec[-1][1] == -1 else "$gt"
+    try:
+        last_id = ObjectId(position.get("id"))
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if field is None:
+        return {"_id": {op: last_id}}
+    value = position.get(field)
+    if position.get("sort") != sort or not isinstance(value, (int, float)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [{field: {op: value}}, {field: value, "_id": {op: last_id}}]}
+
+async def fetch_product_page(
+    db: AsyncIOMotorDatabase,
+    query: dict,
+    limit: int,
+    after: Optional[str],
+    sort: str = "newest"
+) -> dict:
+    """Fetch one page of products using keyset pagination.
+
+    "newest" orders on _id, which embeds the creation time, so it matches
+    created_at while staying unique. Price orders use (price, _id) so ties
+    on price still page deterministically.
+    """
+    spec, field = PRODUCT_SORTS[sort]
+    position = decode_cursor(after)
+    if position:
+        query = {**query, **keyset_filter(sort, position)}
+
+    # Fetch one extra document to know whether another page exists
+    docs = await db["products"].find(query, PRODUCT_PROJECTION).sort(spec).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = {"id": str(docs[-1]["_id"])}
+        if field is not None:
+            last.update({"sort": sort, field: docs[-1].get(field)})
+        next_cursor = encode_cursor(last)
+
+    return catalog_entry(render_products(docs), next_cursor)
 
-def upload_to_cloudinary(file: UploadFile, folder: str = "virtual_store") -> str:
+def stream_products(query: dict, after: Optional[str], sort: str, fmt: StreamFormat, db: AsyncIOMotorDatabase):
+    """Stream every product matching `query` in sort order, starting after the `after` cursor"""
+    spec, _ = PRODUCT_SORTS[sort]
+    position = decode_cursor(after)
+    if position:
+        query = {**query, **keyset_filter(sort, position)}
+    return stream_response(db["products"].find(query, PRODUCT_PROJECTION).sort(spec), encode_product, fmt)
+
+async def search_products(db: AsyncIOMotorDatabase, q: str, filters: dict, offset: int, limit: int) -> List[dict]:
+    """Rank products for `q`, best match first, with one extra result to detect a next page"""
+    global SEARCH_BACKEND
+    if SEARCH_BACKEND == "mongo":
+        try:
+            return await db["products"].find(
+                {"$text": {"$search": q}, **filters},
+                {**PRODUCT_PROJECTION, "score": {"$meta": "textScore"}}
+            ).sort([("score", {"$meta": "textScore"}), ("_id", -1)]).skip(offset).limit(limit + 1).to_list(length=limit + 1)
+        except OperationFailure as e:
+            # Timeouts, stepdowns and bad queries are not a reason to switch backends
+            if e.code != INDEX_NOT_FOUND:
+                raise
+            # No text index (e.g. it failed to build): serve from memory from now on
+            logger.warning(f"Text search unavailable, using in-process index: {e}")
+            SEARCH_BACKEND = "memory"
+
+    await product_search_index.ensure_loaded(db, await get_cache().generation(CATALOG_NAMESPACE))
+    ranked = product_search_index.search(q)
+
+    # Filter in rank order, one batch of candidates at a time, until the page is full
+    wanted = offset + limit + 1
+    docs: List[dict] = []
+    for start in range(0, len(ranked), SEARCH_MAX_CANDIDATES):
+        batch = ranked[start:start + SEARCH_MAX_CANDIDATES]
+        rank = {product_id: i for i, product_id in enumerate(batch)}
+        found = await db["products"].find(
+            {"_id": {"$in": [ObjectId(product_id) for product_id in batch]}, **filters},
+            PRODUCT_PROJECTION
+        ).to_list(length=len(batch))
+        found.sort(key=lambda p: rank[str(p["_id"])])
+        docs.extend(found)
+        if len(docs) >= wanted:
+            break
+    return docs[offset:wanted]
+
+# -------------------------
+# Vendor order queries
+# -------------------------
+# Order fields a vendor dashboard needs; legacy orders stored the amount as total_price
+VENDOR_ORDER_PROJECTION = {
+    "product_id": 1,
+    "customer_id": 1,
+    "vendor_id": 1,
+    "quantity": 1,
+    "total": {"$ifNull": ["$total", "$total_price"]},
+    "status": 1,
+    "payment_method": 1,
+    "payment_status": 1,
+    "mobile": 1,
+    "address": 1,
+    "created_at": 1,
+    "product_name": {"$arrayElemAt": ["$product.name", 0]},
+    "product_image_url": {"$arrayElemAt": ["$product.image_url", 0]},
+}
+
+def vendor_order_pipeline(match: dict, limit: int) -> List[dict]:
     """
-    Uploads a file to Cloudinary and returns the secure URL
+    One page of a vendor's orders, newest first, with product names joined.
+
+    Orders store product_id as a string, so it is converted to an ObjectId
+    before the $lookup can use the products _id index.
     """
+    return [
+        {"$match": match},
+        {"$sort": {"created_at": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$addFields": {"product_oid": {
+            "$convert": {"input": "$product_id", "to": "objectId", "onError": None, "onNull": None}
+        }}},
+        {"$lookup": {"from": "products", "localField": "product_oid", "foreignField": "_id", "as": "product"}},
+        {"$project": VENDOR_ORDER_PROJECTION},
+    ]
+
+def order_keyset_filter(position: dict) -> dict:
+    """Filter selecting the orders after `position` in (created_at, _id) descending order"""
     try:
-        result = cloudinary.uploader.upload(
-            file.file,
-            folder=folder,
-            public_id=f"{folder}_{Path(file.filename).stem}_{int(datetime.utcnow().timestamp())}",
-            overwrite=True,
-            resource_type="image"
-        )
-        return result.get("secure_url")
-    except Exception as e:
-        print("Cloudinary upload failed:", e)
-        return None
+        last_id = ObjectId(position.get("id"))
+        created_at = datetime.fromisoformat(position.get("created_at"))
+    except (InvalidId, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": last_id}}
+    ]}
+
+async def fetch_vendor_orders(
+    db: AsyncIOMotorDatabase,
+    vendor_id: str,
+    limit: int,
+    after: Optional[str],
+    status: Optional[str] = None,
+    payment_status: Optional[str] = None
+) -> Response:
+    match = {"vendor_id": vendor_id}
+    if status:
+        match["status"] = status
+    if payment_status:
+        match["payment_status"] = payment_status
+    position = decode_cursor(after)
+    if position:
+        match.update(order_keyset_filter(position))
+
+    docs = await db["orders"].aggregate(vendor_order_pipeline(match, limit)).to_list(length=limit + 1)
+    headers = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        # Old orders without created_at sort last and cannot be paged past
+        if last.get("created_at"):
+            headers = {NEXT_CURSOR_HEADER: encode_cursor({
+                "id": str(last["_id"]),
+                "created_at": last["created_at"].isoformat()
+            })}
 
-async def create_upi_payment_order(order_id: str, amount: float, customer_id: str, db: AsyncIOMotorDatabase):
-    """Helper function to create UPI payment order"""
+    for doc in docs:
+        doc["id"] = str(doc.pop("_id"))
+    orders = schemas.VENDOR_ORDER_LIST_ADAPTER.validate_python(docs)
+    return json_response(render_json(schemas.VENDOR_ORDER_LIST_ADAPTER.dump_python(orders)), headers=headers)
+
+async def create_upi_payment_order(
+    order_id: str,
+    amount: float,
+    customer_id: str,
+    db: AsyncIOMotorDatabase,
+    order_ids: Optional[List[str]] = None
+):
+    """Helper function to create UPI payment order
+
+    `order_ids` lists every order covered by the payment when one payment
+    settles several orders (cart checkout); `order_id` is the first of them.
+    """
     try:
         # Get UPI configuration from environment
         UPI_ID = os.getenv("UPI_ID", "yourupi@bank")
         STORE_NAME = os.getenv("STORE_NAME", "Virtual Store")
         
         # Generate unique UPI order ID
-        upi_order_id = f"UPI{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+        upi_order_id = new_upi_order_id()
         
         # Create UPI order document
         upi_order = {
@@ -87,6 +344,8 @@ async def create_upi_payment_order(order_id: str, amount: float, customer_id: st
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
+        if order_ids:
+            upi_order["order_ids"] = order_ids
         
         # Insert into database
         await db["upi_orders"].insert_one(upi_order)
@@ -103,7 +362,7 @@ async def create_upi_payment_order(order_id: str, amount: float, customer_id: st
         }
         
     except Exception as e:
-        print(f"UPI payment order creation failed: {str(e)}")
+        logger.error(f"UPI payment order creation failed: {e}")
         return None
 
 # -------------------------
@@ -113,26 +372,30 @@ async def create_upi_payment_order(order_id: str, amount: float, customer_id: st
 @router.post("/orders")
 async def place_order(
     order: OrderCreate,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.IDEMPOTENCY_HEADER, max_length=255),
     user=Depends(auth.require_role(["customer"])),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
-    
-    product = await db["products"].find_one({"_id": ObjectId(order.product_id)})
-    if not product:
+
+    return await idempotency.run(
+        db, idempotency_key, user, "orders", order.model_dump(),
+        lambda: create_single_order(order, user, db)
+    )
+
+async def create_single_order(order: OrderCreate, user: dict, db: AsyncIOMotorDatabase) -> dict:
+    # Check and take stock in one atomic round trip
+    try:
+        product = await inventory.reserve_stock(db, order.product_id, order.quantity)
+    except inventory.ProductNotFound:
         raise HTTPException(status_code=404, detail="Product not found")
-    
-    # Convert stock to int if it's float
-    product_stock = product.get("stock", 0)
-    if isinstance(product_stock, float):
-        product_stock = int(product_stock)
-    
-    if product_stock < order.quantity:
+    except inventory.InsufficientStock:
         raise HTTPException(status_code=400, detail="Not enough stock")
+    except inventory.InvalidQuantity as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    new_stock = product_stock - order.quantity
-    await db["products"].update_one({"_id": ObjectId(order.product_id)}, {"$set": {"stock": new_stock}})
+    new_stock = inventory.remaining_stock(product)
 
     # Calculate total
     total_amount = product["price"] * order.quantity
@@ -151,9 +414,14 @@ async def place_order(
         "payment_status": "pending" if order.payment_method == "upi" else "not_required"
     }
 
-    result = await db["orders"].insert_one(order_doc)
+    try:
+        result = await db["orders"].insert_one(order_doc)
+    except Exception:
+        await inventory.release_stock(db, product["_id"], order.quantity)
+        raise
     order_id = str(result.inserted_id)
     order_doc["id"] = order_id
+    await rollups.record_orders_placed(db, [order_doc])
 
     # Create UPI payment if payment method is UPI
     upi_data = None
@@ -178,12 +446,12 @@ async def place_order(
                 f"📍 Address: {order_doc['address']}\n\n"
                 f"Please prepare the order for delivery."
             )
-            vendor_notified = await send_whatsapp(vendor["whatsapp"], msg)
-            print(f"COD WhatsApp notification sent: {vendor_notified}")
+            vendor_notified = await enqueue_whatsapp(db, vendor["whatsapp"], msg)
+            logger.info("COD order notification queued", extra={"sampled": True, "order_id": order_id, "queued": vendor_notified})
         
         elif order.payment_method == "upi":
             # ❌ NO NOTIFICATION FOR UPI - Will be sent after payment confirmation
-            print(f"UPI order created - Vendor notification will be sent after payment confirmation")
+            logger.info("UPI order created, vendor is notified after payment", extra={"sampled": True, "order_id": order_id})
             vendor_notified = False
 
     response_data = {
@@ -208,15 +476,169 @@ async def place_order(
 
     return response_data
     
+@router.post("/orders/checkout")
+async def checkout_cart(
+    cart: CartCheckout,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.IDEMPOTENCY_HEADER, max_length=255),
+    user=Depends(auth.require_role(["customer"])),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Place one order per cart line with a single bulk stock reservation"""
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
+    return await idempotency.run(
+        db, idempotency_key, user, "checkout", cart.model_dump(),
+        lambda: create_cart_orders(cart, user, db)
+    )
+
+async def create_cart_orders(cart: CartCheckout, user: dict, db: AsyncIOMotorDatabase) -> dict:
+    # Merge repeated products into one line each
+    lines = {}
+    for item in cart.items:
+        try:
+            product_oid = inventory.to_object_id(item.product_id)
+        except inventory.ProductNotFound:
+            raise HTTPException(status_code=404, detail=f"Product not found: {item.product_id}")
+        lines[product_oid] = lines.get(product_oid, 0) + item.quantity
+
+    products = {
+        p["_id"]: p
+        async for p in db["products"].find({"_id": {"$in": list(lines)}}, inventory.RESERVATION_PROJECTION)
+    }
+    missing = [str(pid) for pid in lines if pid not in products]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Product not found: {', '.join(missing)}")
+
+    try:
+        token = await inventory.reserve_many(db, lines)
+    except inventory.InsufficientStock as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    checkout_id = str(ObjectId())
+    mobile = cart.mobile or user.get("mobile", "N/A")
+    address = cart.address or user.get("address", "N/A")
+    created_at = datetime.utcnow()
+    order_docs = [
+        {
+            "product_id": str(pid),
+            "vendor_id": str(products[pid]["vendor_id"]),
+            "customer_id": str(user["_id"]),
+            "checkout_id": checkout_id,
+            "quantity": qty,
+            "total": products[pid]["price"] * qty,
+            "created_at": created_at,
+            "mobile": mobile,
+            "address": address,
+            "status": "pending",
+            "payment_method": cart.payment_method,
+            "payment_status": "pending" if cart.payment_method == "upi" else "not_required"
+        }
+        for pid, qty in lines.items()
+    ]
+
+    try:
+        result = await db["orders"].insert_many(order_docs)
+    except Exception:
+        # The insert may have stored some or all orders before failing (ordered
+        # insert stopping midway, write concern error): remove them before the
+        # stock goes back, so no stored order is left without its stock
+        try:
+            await db["orders"].delete_many({"checkout_id": checkout_id})
+        except Exception as e:
+            # Keeping the reservation is safer than overselling
+            logger.error(f"Could not roll back orders of checkout {checkout_id}, stock stays reserved: {e}")
+            raise
+        await inventory.release_many(db, lines, token)
+        raise
+    await inventory.commit_many(db, lines, token)
+    await rollups.record_orders_placed(db, order_docs)
+
+    # Group orders per vendor: one payment and one notification each
+    vendor_groups = {}
+    for doc, inserted_id in zip(order_docs, result.inserted_ids):
+        doc["id"] = str(inserted_id)
+        vendor_groups.setdefault(doc["vendor_id"], []).append(doc)
+
+    payments = []
+    if cart.payment_method == "upi":
+        payments = await asyncio.gather(*[
+            create_upi_payment_order(
+                docs[0]["id"],
+                sum(d["total"] for d in docs),
+                str(user["_id"]),
+                db,
+                order_ids=[d["id"] for d in docs]
+            )
+            for docs in vendor_groups.values()
+        ])
+    elif cart.payment_method == "cod":
+        vendors = db["vendors"].find(
+            {"_id": {"$in": [ObjectId(v) for v in vendor_groups]}},
+            {"whatsapp": 1}
+        )
+        async for vendor in vendors:
+            if not vendor.get("whatsapp"):
+                continue
+            docs = vendor_groups[str(vendor["_id"])]
+            order_lines = "".join(
+                f"📦 Product: {products[ObjectId(d['product_id'])]['name']}\n"
+                f"⚖️ Quantity: {d['quantity']} kg\n"
+                for d in docs
+            )
+            msg = (
+                f"🛒 *New COD Order Received!*\n\n"
+                f"{order_lines}"
+                f"💰 Total: ₹{sum(d['total'] for d in docs):.2f}\n"
+                f"💵 Payment: Cash on Delivery\n\n"
+                f"👤 Customer: {user.get('username', 'N/A')}\n"
+                f"📱 Mobile: {mobile}\n"
+                f"📍 Address: {address}\n\n"
+                f"Please prepare the order for delivery."
+            )
+            await enqueue_whatsapp(db, vendor["whatsapp"], msg)
+
+    return {
+        "checkout_id": checkout_id,
+        "total": sum(d["total"] for d in order_docs),
+        "orders": [
+            {
+                "id": d["id"],
+                "product_id": d["product_id"],
+                "vendor_id": d["vendor_id"],
+                "quantity": d["quantity"],
+                "total": d["total"],
+                "status": d["status"],
+                "payment_method": d["payment_method"],
+                "payment_status": d["payment_status"]
+            }
+            for d in order_docs
+        ],
+        # Confirm each payment with its order_id (the first order of the vendor group)
+        "upi_payments": [
+            {"vendor_id": vendor_id, "order_id": docs[0]["id"], **payment}
+            for (vendor_id, docs), payment in zip(vendor_groups.items(), payments)
+            if payment
+        ]
+    }
+
 @router.post("/orders/{order_id}/confirm-payment")
 async def confirm_order_payment(
     order_id: str,
     payment_data: PaymentConfirm,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.IDEMPOTENCY_HEADER, max_length=255),
     user=Depends(auth.require_role(["customer"])),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    # ... existing validation code ...
-    
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
+    return await idempotency.run(
+        db, idempotency_key, user, "confirm-payment", {"order_id": order_id, **payment_data.model_dump()},
+        lambda: confirm_upi_order(order_id, payment_data, user, db)
+    )
+
+async def confirm_upi_order(order_id: str, payment_data: PaymentConfirm, user: dict, db: AsyncIOMotorDatabase) -> dict:
     try:
         # Find UPI order
         upi_order = await db["upi_orders"].find_one({"order_id": order_id})
@@ -236,33 +658,33 @@ async def confirm_order_payment(
             }
         )
         
-        # Update main order payment status
-        await db["orders"].update_one(
-            {"_id": ObjectId(order_id)},
-            {
-                "$set": {
-                    "payment_status": "paid",
-                    "status": "confirmed",
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
+        # Update main order payment status (a cart payment covers several orders)
+        order_oids = [ObjectId(i) for i in upi_order.get("order_ids") or [order_id]]
+        await rollups.mark_orders_paid(db, order_oids)
         
         # ✅ ADDED: Notify vendor ONLY after UPI payment is confirmed
         vendor_notified = False
-        order = await db["orders"].find_one({"_id": ObjectId(order_id)})
+        orders = await db["orders"].find({"_id": {"$in": order_oids}}).to_list(length=len(order_oids))
+        order = orders[0]
         vendor = await db["vendors"].find_one({"_id": ObjectId(order["vendor_id"])})
         
         if vendor and vendor.get("whatsapp"):
-            product = await db["products"].find_one({"_id": ObjectId(order["product_id"])})
-            product_name = product["name"] if product else "Unknown Product"
+            products = await db["products"].find(
+                {"_id": {"$in": [ObjectId(o["product_id"]) for o in orders]}},
+                {"name": 1}
+            ).to_list(length=len(orders))
+            product_names = {str(p["_id"]): p["name"] for p in products}
+            order_lines = "".join(
+                f"🛍️ Product: {product_names.get(o['product_id'], 'Unknown Product')}\n"
+                f"⚖️ Quantity: {o['quantity']} kg\n"
+                for o in orders
+            )
             
             # Payment success message to vendor
             msg = (
                 f"✅ *Payment Confirmed - New Order!* ✅\n\n"
                 f"🆔 Order ID: {order_id}\n"
-                f"🛍️ Product: {product_name}\n"
-                f"⚖️ Quantity: {order['quantity']} kg\n"
+                f"{order_lines}"
                 f"💰 Amount: ₹{payment_data.amount:.2f}\n"
                 f"💳 Payment: UPI (Confirmed)\n"
                 f"🔗 Transaction ID: {payment_data.transaction_id or 'Not provided'}\n\n"
@@ -271,8 +693,8 @@ async def confirm_order_payment(
                 f"📍 Address: {order.get('address', 'N/A')}\n\n"
                 f"Please proceed with order fulfillment."
             )
-            vendor_notified = await send_whatsapp(vendor["whatsapp"], msg)
-            print(f"UPI payment WhatsApp notification sent: {vendor_notified}")
+            vendor_notified = await enqueue_whatsapp(db, vendor["whatsapp"], msg)
+            logger.info("UPI payment notification queued", extra={"sampled": True, "order_id": order_id, "queued": vendor_notified})
         
         return {
             "success": True,
@@ -284,49 +706,91 @@ async def confirm_order_payment(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Payment confirmation failed: {str(e)}")
 
+@router.get("/products/search", response_model=List[schemas.ProductOut])
+async def search_products_endpoint(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    vendor_id: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header"),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Full-text search over product name and description, most relevant first"""
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
+    filters = catalog_filters(vendor_id, False, min_price, max_price)
+
+    # Relevance scores are not unique, so search pages by offset
+    position = decode_cursor(after) or {}
+    offset = position.get("offset", 0)
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    cache_key = await catalog_cache_key("search", q.lower(), vendor_id or "", min_price, max_price, limit, offset)
+    page = await get_cache().get(cache_key)
+    if page is None:
+        docs = await search_products(db, q, filters, offset, limit)
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_cursor({"offset": offset + limit})
+        page = catalog_entry(render_products(docs), next_cursor)
+        await get_cache().set(cache_key, page)
+
+    return page_response(request, page)
+
 @router.get("/products/{product_id}", response_model=schemas.ProductOut)
-async def get_product(product_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
+async def get_product(product_id: str, request: Request, db: AsyncIOMotorDatabase = Depends(get_db)):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
-    try:
-        product = await db["products"].find_one({"_id": ObjectId(product_id)})
-    except:
-        raise HTTPException(status_code=400, detail="Invalid product ID")
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    # Convert stock to int if it's float
-    stock = product.get("stock", 0)
-    if isinstance(stock, float):
-        stock = int(stock)
-        product["stock"] = stock
-    
-    return schemas.ProductOut.from_mongo(product)
+
+    cache_key = await catalog_cache_key("product", product_id)
+    entry = await get_cache().get(cache_key)
+    if entry is None:
+        try:
+            product = await db["products"].find_one({"_id": ObjectId(product_id)}, PRODUCT_PROJECTION)
+        except:
+            raise HTTPException(status_code=400, detail="Invalid product ID")
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+
+        entry = catalog_entry(render_json(schemas.ProductOut.model_validate(product).model_dump()))
+        await get_cache().set(cache_key, entry)
+
+    return page_response(request, entry)
 
 @router.get("/products", response_model=List[schemas.ProductOut])
-async def list_all_products(db: AsyncIOMotorDatabase = Depends(get_db)):
+async def list_all_products(
+    request: Request,
+    vendor_id: Optional[str] = None,
+    in_stock: bool = False,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: Literal["newest", "price_asc", "price_desc"] = "newest",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header"),
+    stream: Optional[StreamFormat] = Query(None, description="Stream all matches as a JSON array or NDJSON, ignoring limit"),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
-    
-    products_cursor = db["products"].find({})
-    products = []
-    async for p in products_cursor:
-        # Convert stock to int if it's float
-        stock = p.get("stock", 0)
-        if isinstance(stock, float):
-            stock = int(stock)
-        
-        products.append(
-            schemas.ProductOut(
-                id=str(p["_id"]),
-                name=p.get("name", ""),
-                description=p.get("description"),
-                price=p.get("price", 0),
-                stock=stock,  # Use converted stock value
-                image_url=p.get("image_url")
-            )
-        )
-    return products
+
+    filters = catalog_filters(vendor_id, in_stock, min_price, max_price)
+    if stream:
+        return stream_products(filters, after, sort, stream, db)
+
+    cache_key = await catalog_cache_key(
+        "products", vendor_id or "", in_stock, min_price, max_price, sort, limit, after or ""
+    )
+    page = await get_cache().get(cache_key)
+    if page is None:
+        page = await fetch_product_page(db, filters, limit, after, sort)
+        await get_cache().set(cache_key, page)
+
+    return page_response(request, page)
 
 # -------------------------
 # Vendor Endpoints
@@ -340,16 +804,12 @@ async def update_product(
     price: float = Form(...),        # ADD Form()
     stock: int = Form(...),          # ADD Form()
     file: Optional[UploadFile] = File(None),
-    user=Depends(auth.require_role(["vendor"])),
+    vendor=Depends(auth.get_vendor_context),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     # ... rest of your code remains the same
     if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
-    
-    vendor = await db["vendors"].find_one({"user_id": str(user["_id"]), "status": "approved"})
-    if not vendor:
-        raise HTTPException(status_code=403, detail="Vendor not approved")
 
     db_product = await db["products"].find_one({"_id": ObjectId(product_id), "vendor_id": vendor["_id"]})
     if not db_product:
@@ -359,9 +819,11 @@ async def update_product(
     
     if file:
         # Upload image to Cloudinary instead of local storage
-        updated_data["image_url"] = upload_to_cloudinary(file, folder=f"vendor_{vendor['_id']}")
+        updated_data["image_url"] = await upload_image(file, folder=f"vendor_{vendor['_id']}")
 
     await db["products"].update_one({"_id": db_product["_id"]}, {"$set": updated_data})
+    await invalidate_catalog()
+    product_search_index.upsert(db_product["_id"], name, description)
     updated_product = await db["products"].find_one({"_id": db_product["_id"]})
     
     # Convert stock to int if it's float
@@ -419,21 +881,19 @@ async def debug_vendor(vendor_id: str, db: AsyncIOMotorDatabase = Depends(get_db
 @router.delete("/products/{product_id}")
 async def delete_product(
     product_id: str,
-    user=Depends(auth.require_role(["vendor"])),
+    vendor=Depends(auth.get_vendor_context),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
-    
-    vendor = await db["vendors"].find_one({"user_id": str(user["_id"]), "status": "approved"})
-    if not vendor:
-        raise HTTPException(status_code=403, detail="Vendor not approved")
 
     db_product = await db["products"].find_one({"_id": ObjectId(product_id), "vendor_id": vendor["_id"]})
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
 
     await db["products"].delete_one({"_id": db_product["_id"]})
+    await invalidate_catalog()
+    product_search_index.remove(db_product["_id"])
     return {"detail": "Product deleted successfully"}
 
 @router.post("/products", response_model=schemas.ProductOut)
@@ -444,20 +904,15 @@ async def create_product(
     price: float = Form(...),
     stock: float = Form(...),
     file: Optional[UploadFile] = File(None),
-    user=Depends(auth.require_role(["vendor"])),
+    vendor=Depends(auth.get_vendor_context),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
-    
-    # Check vendor approval
-    vendor = await db["vendors"].find_one({"user_id": str(user["_id"]), "status": "approved"})
-    if not vendor:
-        raise HTTPException(status_code=403, detail="Vendor not approved")
 
     image_url = None
     if file:
-        image_url = upload_to_cloudinary(file, folder=f"vendor_{vendor['_id']}")
+        image_url = await upload_image(file, folder=f"vendor_{vendor['_id']}")
 
     # Convert stock to int if it's float
     if isinstance(stock, float):
@@ -474,6 +929,8 @@ async def create_product(
     }
 
     result = await db["products"].insert_one(product_doc)
+    await invalidate_catalog()
+    product_search_index.upsert(result.inserted_id, name, description)
     
     return schemas.ProductOut(
         id=str(result.inserted_id),
@@ -525,20 +982,18 @@ async def apply_vendor_endpoint(
 
     # Send WhatsApp to the applicant
     if normalized_whatsapp:
-        asyncio.create_task(
-            send_whatsapp(
-                normalized_whatsapp,
-                "✅ Your vendor application has been received! Please wait for approval."
-            )
+        await enqueue_whatsapp(
+            db,
+            normalized_whatsapp,
+            "✅ Your vendor application has been received! Please wait for approval."
         )
 
     # Optional: Notify admin WhatsApp
     if TWILIO_WHATSAPP_ADMIN:
-        asyncio.create_task(
-            send_whatsapp(
-                TWILIO_WHATSAPP_ADMIN,
-                f"🆕 New Vendor Application!\nShop: {shop_name}\nUser: {user.get('username')}\nWhatsApp: {normalized_whatsapp}"
-            )
+        await enqueue_whatsapp(
+            db,
+            TWILIO_WHATSAPP_ADMIN,
+            f"🆕 New Vendor Application!\nShop: {shop_name}\nUser: {user.get('username')}\nWhatsApp: {normalized_whatsapp}"
         )
 
     return vendor_doc
@@ -554,19 +1009,40 @@ async def get_vendor_status(user_id: str, db: AsyncIOMotorDatabase = Depends(get
     return {"status": vendor.get("status", "pending")}
 
 @router.get("/vendors", response_model=List[schemas.VendorOut])
-async def list_approved_vendors(db: AsyncIOMotorDatabase = Depends(get_db)):
+async def list_approved_vendors(
+    request: Request,
+    stream: Optional[StreamFormat] = Query(None, description="Stream as a JSON array or NDJSON"),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
-    
-    vendors_cursor = db["vendors"].find({"status": "approved"})
-    vendors = []
-    async for v in vendors_cursor:
-        v["id"] = str(v["_id"])
-        vendors.append(v)
-    return vendors
+
+    if stream:
+        return stream_response(db["vendors"].find({"status": "approved"}), encode_vendor, stream)
+
+    cache_key = await catalog_cache_key("vendors")
+    entry = await get_cache().get(cache_key)
+    if entry is None:
+        vendors_cursor = db["vendors"].find({"status": "approved"})
+        vendors = []
+        async for v in vendors_cursor:
+            v["id"] = str(v["_id"])
+            vendors.append(v)
+        vendors = schemas.VENDOR_LIST_ADAPTER.validate_python(vendors)
+        entry = catalog_entry(render_json(schemas.VENDOR_LIST_ADAPTER.dump_python(vendors)))
+        await get_cache().set(cache_key, entry)
+
+    return page_response(request, entry)
 
 @router.get("/vendors/{vendor_id}/products", response_model=List[schemas.ProductOut])
-async def get_vendor_products(vendor_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
+async def get_vendor_products(
+    request: Request,
+    vendor_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header"),
+    stream: Optional[StreamFormat] = Query(None, description="Stream all products as a JSON array or NDJSON, ignoring limit"),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
     
@@ -575,25 +1051,16 @@ async def get_vendor_products(vendor_id: str, db: AsyncIOMotorDatabase = Depends
     except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid vendor_id")
 
-    products_cursor = db["products"].find({"vendor_id": vendor_oid})
-    products = []
-    async for p in products_cursor:
-        # Convert stock to int if it's float
-        stock = p.get("stock", 0)
-        if isinstance(stock, float):
-            stock = int(stock)
-        
-        products.append(
-            schemas.ProductOut(
-                id=str(p["_id"]),
-                name=p.get("name", ""),
-                description=p.get("description"),
-                price=p.get("price", 0),
-                stock=stock,
-                image_url=p.get("image_url")
-            )
-        )
-    return products
+    if stream:
+        return stream_products({"vendor_id": vendor_oid}, after, "newest", stream, db)
+
+    cache_key = await catalog_cache_key("vendor", vendor_id, "products", limit, after or "")
+    page = await get_cache().get(cache_key)
+    if page is None:
+        page = await fetch_product_page(db, {"vendor_id": vendor_oid}, limit, after)
+        await get_cache().set(cache_key, page)
+
+    return page_response(request, page)
 
 @router.get("/vendors/my-vendor", response_model=schemas.VendorOut)
 async def get_my_vendor(
@@ -616,14 +1083,36 @@ async def get_my_vendor(
     
     return schemas.VendorOut.from_mongo(vendor)
 
+@router.get("/vendors/my-orders", response_model=List[schemas.VendorOrderOut])
+async def list_my_vendor_orders(
+    status: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header"),
+    vendor=Depends(auth.get_vendor_context),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Orders placed with the current vendor, newest first"""
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
+    return await fetch_vendor_orders(db, str(vendor["_id"]), limit, after, status, payment_status)
+
 # -------------------------
 # Admin Endpoints
 # -------------------------
 @router.get("/vendors/pending", response_model=List[schemas.VendorOut])
-async def list_pending_vendors(user=Depends(auth.require_role(["admin"])), db: AsyncIOMotorDatabase = Depends(get_db)):
+async def list_pending_vendors(
+    stream: Optional[StreamFormat] = Query(None, description="Stream as a JSON array or NDJSON"),
+    user=Depends(auth.require_role(["admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
-    
+
+    if stream:
+        return stream_response(db["vendors"].find({"status": "pending"}), encode_vendor, stream)
+
     vendors_cursor = db["vendors"].find({"status": "pending"})
     vendors = []
     async for v in vendors_cursor:
@@ -642,6 +1131,9 @@ async def approve_vendor(vendor_id: str, user=Depends(auth.require_role(["admin"
 
     await db["vendors"].update_one({"_id": ObjectId(vendor_id)}, {"$set": {"status": "approved"}})
     await db["users"].update_one({"_id": ObjectId(vendor["user_id"])}, {"$set": {"role": "vendor"}})
+    await auth.invalidate_user(vendor["user_id"])
+    await auth.invalidate_vendor_context(vendor["user_id"])
+    await invalidate_catalog()
 
     # Get the updated user to create a new token
     updated_user = await db["users"].find_one({"_id": ObjectId(vendor["user_id"])})
@@ -656,7 +1148,7 @@ async def approve_vendor(vendor_id: str, user=Depends(auth.require_role(["admin"
 
     # Notify user
     if updated_user and updated_user.get("whatsapp"):
-        asyncio.create_task(send_whatsapp(updated_user.get("whatsapp"), "Congratulations! Your vendor application has been approved."))
+        await enqueue_whatsapp(db, updated_user.get("whatsapp"), "Congratulations! Your vendor application has been approved.")
 
     return {
         "detail": f"Vendor {vendor_id} approved",
@@ -673,12 +1165,27 @@ async def reject_vendor(vendor_id: str, user=Depends(auth.require_role(["admin"]
         raise HTTPException(status_code=404, detail="Vendor not found")
 
     await db["vendors"].update_one({"_id": ObjectId(vendor_id)}, {"$set": {"status": "rejected"}})
+    await auth.invalidate_user(vendor["user_id"])
+    await auth.invalidate_vendor_context(vendor["user_id"])
+    await invalidate_catalog()
     user_doc = await db["users"].find_one({"_id": ObjectId(vendor["user_id"])})
     if user_doc and user_doc.get("whatsapp"):
-        asyncio.create_task(send_whatsapp(user_doc.get("whatsapp"), "Your vendor application has been rejected. You can reapply later."))
+        await enqueue_whatsapp(db, user_doc.get("whatsapp"), "Your vendor application has been rejected. You can reapply later.")
 
     return {"detail": f"Vendor {vendor_id} rejected"}
 
+@router.get("/admin/notifications/stats")
+async def notification_outbox_stats(user=Depends(auth.require_role(["admin"])), db: AsyncIOMotorDatabase = Depends(get_db)):
+    """Notification outbox queue depth and delivery counters"""
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    return await get_outbox_stats(db)
+
+@router.get("/admin/uploads/stats")
+async def upload_executor_stats(user=Depends(auth.require_role(["admin"]))):
+    """Image upload executor concurrency and queue-time metrics"""
+    return get_upload_stats()
+
 # Add this to your main.py or store.py for testing
 @router.get("/debug/check-order-schema")
 async def debug_check_order_schema():
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 from app import schemas, auth
-from app.auth import hash_password, verify_password
+from app.auth import hash_password_async, verify_password_async, password_needs_rehash
 from app.database import get_db
-import traceback
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Users"])
 
@@ -32,13 +35,7 @@ async def signup(user: schemas.UserCreate, db: AsyncIOMotorDatabase = Depends(ge
         raise HTTPException(status_code=400, detail="Email already registered")
 
     try:
-        # Add more debugging
-        print(f"[DEBUG] Password to hash: '{user.password}'")
-        print(f"[DEBUG] Password type: {type(user.password)}")
-        
-        hashed_password = hash_password(user.password)
-        print(f"[DEBUG] Hashed password type: {type(hashed_password)}")
-        print(f"[DEBUG] Hashed password sample: {str(hashed_password)[:50]}")
+        hashed_password = await hash_password_async(user.password)
 
         # Ensure it's a string
         if not isinstance(hashed_password, str):
@@ -53,15 +50,20 @@ async def signup(user: schemas.UserCreate, db: AsyncIOMotorDatabase = Depends(ge
             "role": "customer",
         }
 
-        result = await db["users"].insert_one(user_dict)
-        
+        try:
+            result = await db["users"].insert_one(user_dict)
+        except DuplicateKeyError:
+            # Lost a race with a concurrent signup for the same email (unique index)
+            raise HTTPException(status_code=400, detail="Email already registered")
+
         token_data = {"sub": str(result.inserted_id), "role": "customer", "email": email}
         access_token = auth.create_access_token(token_data)
         return {"access_token": access_token, "token_type": "bearer"}
 
-    except Exception as e:
-        print(f"[DEBUG] ERROR during signup: {type(e).__name__}: {str(e)}")
-        traceback.print_exc()
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Signup failed")
         raise HTTPException(status_code=500, detail="Internal server error during registration")
 
 
@@ -71,9 +73,14 @@ async def login(form_data: schemas.UserLogin, db: AsyncIOMotorDatabase = Depends
         raise RuntimeError("Database not connected")
     identifier = (form_data.email or "").strip().lower()
     user = await db["users"].find_one({"email": identifier})
-    if not user or not verify_password(form_data.password, user.get("password", "")):
+    if not user or not await verify_password_async(form_data.password, user.get("password", "")):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    # Upgrade hashes made with an older BCRYPT_ROUNDS while we have the plaintext
+    if password_needs_rehash(user.get("password", "")):
+        new_hash = await hash_password_async(form_data.password)
+        await db["users"].update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
+
     token = auth.create_access_token({
         "sub": str(user["_id"]),
         "role": user.get("role"),
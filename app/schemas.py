@@ -1,8 +1,8 @@
-from pydantic import BaseModel, EmailStr, ConfigDict, field_validator
-from typing import Optional
+from pydantic import AliasChoices, BaseModel, EmailStr, ConfigDict, Field, TypeAdapter, field_validator
+from typing import List, Optional
 import re
 from bson import ObjectId
-from datetime import datetime  # ✅ ADD THIS IMPORT
+from datetime import date, datetime  # ✅ ADD THIS IMPORT
 
 # -----------------------
 # Helper function
@@ -102,6 +102,9 @@ class VendorOut(BaseModel):
         return cls(**vendor_dict)
 
 
+VENDOR_LIST_ADAPTER = TypeAdapter(List[VendorOut])
+
+
 # -----------------------
 # Product Schemas
 # -----------------------
@@ -114,29 +117,41 @@ class ProductCreate(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 class ProductOut(BaseModel):
-    id: str
-    name: str
+    # Validates straight from Mongo documents: `_id` feeds `id`
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
+    name: str = ""
     description: Optional[str] = None
-    price: float
-    stock: int
+    price: float = 0
+    stock: int = 0
     image_url: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def object_id_to_str(cls, v):
+        return str(v) if isinstance(v, ObjectId) else v
+
+    @field_validator("stock", mode="before")
+    @classmethod
+    def convert_float_to_int(cls, v):
+        if v is None:
+            return 0
+        if isinstance(v, float):
+            return int(v)
+        if isinstance(v, str) and v.replace('.', '').isdigit():
+            return int(float(v))
+        return v
     
     @classmethod
     def from_mongo(cls, product_dict):
         """Convert MongoDB document to ProductOut"""
         if not product_dict:
             return None
-            
-        # Convert ObjectId to string
-        if '_id' in product_dict:
-            product_dict = product_dict.copy()
-            product_dict['id'] = str(product_dict['_id'])
-        
-        # Ensure stock is integer
-        if 'stock' in product_dict and isinstance(product_dict['stock'], float):
-            product_dict['stock'] = int(product_dict['stock'])
-            
-        return cls(**product_dict)
+        return cls.model_validate(product_dict)
+
+# One compiled validator/serializer for whole product lists
+PRODUCT_LIST_ADAPTER = TypeAdapter(List[ProductOut])
 
 
 # -----------------------
@@ -151,6 +166,20 @@ class OrderCreate(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class CartItem(BaseModel):
+    product_id: str
+    quantity: float = Field(gt=0)
+
+    model_config = ConfigDict(from_attributes=True)
+
+class CartCheckout(BaseModel):
+    items: List[CartItem] = Field(min_length=1, max_length=100)
+    mobile: Optional[str] = None
+    address: Optional[str] = None
+    payment_method: str  # "upi" or "cod"
+
+    model_config = ConfigDict(from_attributes=True)
+
 class OrderOut(BaseModel):
     id: str
     product_id: str
@@ -183,6 +212,40 @@ class OrderOut(BaseModel):
             mobile=doc.get("mobile"),
             address=doc.get("address"),
         )
+
+
+class VendorOrderOut(OrderOut):
+    """Order row in the vendor dashboard, with the product joined in"""
+    product_name: Optional[str] = None
+    product_image_url: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+VENDOR_ORDER_LIST_ADAPTER = TypeAdapter(List[VendorOrderOut])
+
+# -----------------------
+# Analytics Schemas
+# -----------------------
+class DailySalesOut(BaseModel):
+    day: date
+    vendor_id: Optional[str] = None
+    orders: int = 0
+    units: float = 0
+    revenue: float = 0
+    paid_orders: int = 0
+    paid_revenue: float = 0
+
+
+class VendorSalesOut(BaseModel):
+    vendor_id: str
+    shop_name: Optional[str] = None
+    orders: int = 0
+    units: float = 0
+    revenue: float = 0
+    paid_orders: int = 0
+    paid_revenue: float = 0
+
+
 # -----------------------
 # Payment Schemas (ADD THIS SECTION)
 # -----------------------
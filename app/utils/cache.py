@@ -0,0 +1,172 @@
+# app/utils/cache.py
+import os
+import json
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Backend selection: "memory" (per process) or "redis" (shared by all workers).
+# Defaults to redis when REDIS_URL is configured, memory otherwise.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "redis" if os.getenv("REDIS_URL") else "memory").lower()
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 60))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 2048))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class CacheBackend:
+    """Minimal async cache interface shared by all backends"""
+
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        raise NotImplementedError
+
+    async def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        return None
+
+    # Namespaces are invalidated by bumping a generation counter that is part
+    # of every key, so a whole family of keys (e.g. every catalog page) can be
+    # dropped in one call without scanning the keyspace.
+    async def generation(self, namespace: str) -> int:
+        value = await self.get(f"{namespace}:gen")
+        return int(value) if value is not None else 0
+
+    async def namespaced_key(self, namespace: str, *parts: Any) -> str:
+        gen = await self.generation(namespace)
+        return ":".join([namespace, str(gen), *[str(p) for p in parts]])
+
+    async def invalidate(self, namespace: str) -> int:
+        return await self.incr(f"{namespace}:gen")
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache with per-entry TTL"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: int = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at and expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else 0
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        # Counters never expire, otherwise a generation could roll back
+        entry = self._data.get(key)
+        value = int(entry[1]) + 1 if entry else 1
+        self._data[key] = (0, value)
+        return value
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class RedisCache(CacheBackend):
+    """Redis-backed cache shared across worker processes.
+
+    Values are stored JSON-encoded. Redis errors are logged and treated as
+    cache misses so the API keeps serving from MongoDB if Redis goes away.
+    """
+
+    def __init__(self, url: str = REDIS_URL, ttl: int = CACHE_TTL_SECONDS):
+        import redis.asyncio as redis_asyncio
+
+        self.ttl = ttl
+        self._redis = redis_asyncio.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = await self._redis.get(key)
+        except Exception as e:
+            logger.warning(f"Redis get failed for {key}: {e}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            await self._redis.set(key, json.dumps(value, default=str), ex=ttl or None)
+        except Exception as e:
+            logger.warning(f"Redis set failed for {key}: {e}")
+
+    async def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        try:
+            await self._redis.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Redis delete failed for {keys}: {e}")
+
+    async def incr(self, key: str) -> int:
+        try:
+            return int(await self._redis.incr(key))
+        except Exception as e:
+            logger.warning(f"Redis incr failed for {key}: {e}")
+            return 0
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+_cache: Optional[CacheBackend] = None
+
+
+def get_cache() -> CacheBackend:
+    """Return the process-wide cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        if CACHE_BACKEND == "redis":
+            _cache = RedisCache()
+        else:
+            _cache = MemoryCache()
+    return _cache
+
+
+def check_cache_backend() -> None:
+    """Warn on startup when a per-process cache runs under several workers"""
+    # uvicorn reads its default --workers from WEB_CONCURRENCY
+    workers = int(os.getenv("WEB_CONCURRENCY") or 1)
+    if CACHE_BACKEND != "redis" and workers > 1:
+        logger.warning(
+            f"CACHE_BACKEND={CACHE_BACKEND} with {workers} workers: invalidations only reach the worker "
+            f"that made the write, others may serve stale catalog pages for up to {CACHE_TTL_SECONDS}s. "
+            f"Set CACHE_BACKEND=redis to share the cache."
+        )
+
+
+async def close_cache() -> None:
+    """Close the cache backend on shutdown"""
+    global _cache
+    if _cache is not None:
+        await _cache.close()
+        _cache = None
@@ -2,8 +2,19 @@
 import cloudinary
 import cloudinary.uploader
 import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
 from fastapi import UploadFile
 
+from app.utils.metrics import outbound_timer
+
+logger = logging.getLogger(__name__)
+
 # Configure Cloudinary using your environment variables
 cloudinary.config(
     cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
@@ -12,26 +23,126 @@ cloudinary.config(
     secure=True
 )
 
-def upload_to_cloudinary(file: UploadFile, folder: str = "products") -> str:
+# Upload executor settings
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 4))
+UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", UPLOAD_WORKERS))
+UPLOAD_TIMEOUT_SECONDS = float(os.getenv("UPLOAD_TIMEOUT_SECONDS", 30))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+upload_stats = {
+    "uploads_total": 0,
+    "failures_total": 0,
+    "timeouts_total": 0,
+    "in_flight": 0,
+    "waiting": 0,
+    "queue_seconds_total": 0.0,
+    "queue_seconds_max": 0.0,
+    "upload_seconds_total": 0.0,
+}
+
+
+def upload_to_cloudinary(file: UploadFile, folder: str = "products") -> Optional[str]:
     """
-    Upload a FastAPI UploadFile to Cloudinary.
+    Upload a FastAPI UploadFile to Cloudinary (blocking).
 
     Args:
         file (UploadFile): The uploaded file from FastAPI form.
         folder (str): Cloudinary folder to store the file in.
 
     Returns:
-        str: The URL of the uploaded image.
+        str: The URL of the uploaded image, or None if the upload failed.
     """
     try:
-        result = cloudinary.uploader.upload(
-            file.file,
-            folder=folder,
-            public_id=None,  # auto-generated
-            overwrite=True,
-            resource_type="image"
-        )
+        with outbound_timer("cloudinary", "upload"):
+            result = cloudinary.uploader.upload(
+                file.file,
+                folder=folder,
+                public_id=f"{folder}_{Path(file.filename).stem}_{int(datetime.utcnow().timestamp())}",
+                overwrite=True,
+                resource_type="image",
+                timeout=UPLOAD_TIMEOUT_SECONDS
+            )
         return result.get("secure_url")
     except Exception as e:
-        print(f"Cloudinary upload failed: {e}")
+        logger.error(f"Cloudinary upload failed: {e}")
         return None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="cloudinary-upload")
+    return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(UPLOAD_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def upload_image(file: UploadFile, folder: str = "products") -> Optional[str]:
+    """
+    Upload an image without blocking the event loop.
+
+    The blocking Cloudinary call runs on a bounded thread pool; at most
+    UPLOAD_MAX_CONCURRENCY uploads run at once and each one is abandoned
+    after UPLOAD_TIMEOUT_SECONDS. Returns the image URL or None on failure.
+    """
+    semaphore = _get_semaphore()
+    queued_at = time.perf_counter()
+    upload_stats["waiting"] += 1
+    try:
+        await semaphore.acquire()
+    finally:
+        # Also when the request is cancelled while queued (client went away)
+        upload_stats["waiting"] -= 1
+
+    try:
+        started_at = time.perf_counter()
+        queue_seconds = started_at - queued_at
+        upload_stats["queue_seconds_total"] += queue_seconds
+        upload_stats["queue_seconds_max"] = max(upload_stats["queue_seconds_max"], queue_seconds)
+        upload_stats["in_flight"] += 1
+        upload_stats["uploads_total"] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            url = await asyncio.wait_for(
+                loop.run_in_executor(_get_executor(), upload_to_cloudinary, file, folder),
+                timeout=UPLOAD_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            upload_stats["timeouts_total"] += 1
+            logger.error(f"Cloudinary upload timed out after {UPLOAD_TIMEOUT_SECONDS}s")
+            url = None
+        finally:
+            upload_stats["in_flight"] -= 1
+            upload_stats["upload_seconds_total"] += time.perf_counter() - started_at
+    finally:
+        semaphore.release()
+
+    if url is None:
+        upload_stats["failures_total"] += 1
+    return url
+
+
+def get_upload_stats() -> dict:
+    """Upload executor counters and queue-time metrics"""
+    uploads = upload_stats["uploads_total"]
+    return {
+        **upload_stats,
+        "workers": UPLOAD_WORKERS,
+        "max_concurrency": UPLOAD_MAX_CONCURRENCY,
+        "queue_seconds_avg": upload_stats["queue_seconds_total"] / uploads if uploads else 0.0,
+    }
+
+
+def shutdown_upload_executor() -> None:
+    """Stop the upload thread pool on shutdown"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
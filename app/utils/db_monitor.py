@@ -0,0 +1,189 @@
+# app/utils/db_monitor.py
+import os
+import time
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+from pymongo import monitoring
+
+from app.utils.metrics import REGISTRY, Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Commands slower than this are logged with their filter shape; 0 disables the log
+MONGO_SLOW_COMMAND_MS = float(os.getenv("MONGO_SLOW_COMMAND_MS", 100))
+# Requests issuing at least this many commands are logged as N+1 suspects; 0 disables
+MONGO_REQUEST_COMMANDS_WARN = int(os.getenv("MONGO_REQUEST_COMMANDS_WARN", 25))
+# Send X-DB-Commands / X-DB-Time-ms on every response. Off by default: they
+# reveal backend timing and query counts to any client; enable for debugging
+DB_STATS_HEADERS = os.getenv("DB_STATS_HEADERS", "false").lower() in ("1", "true", "yes")
+
+DB_COMMANDS_HEADER = "X-DB-Commands"
+DB_TIME_HEADER = "X-DB-Time-ms"
+
+DB_COMMANDS_PER_REQUEST = REGISTRY.register(Histogram(
+    "db_commands_per_request", "MongoDB commands issued per HTTP request", ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+))
+DB_TIME_SECONDS = REGISTRY.register(Counter(
+    "db_time_seconds_total", "Time spent in MongoDB commands by HTTP route", ("route",)
+))
+
+
+class RequestDbStats:
+    """Commands issued on behalf of one request. Updated from Motor's executor threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commands = 0
+        self.duration_micros = 0
+        self.by_command: Dict[str, int] = {}
+
+    def add(self, command_name: str, duration_micros: int) -> None:
+        with self._lock:
+            self.commands += 1
+            self.duration_micros += duration_micros
+            self.by_command[command_name] = self.by_command.get(command_name, 0) + 1
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration_micros / 1000
+
+
+# Motor runs every operation in an executor with a copy of the caller's
+# context, so pymongo's listener callbacks see the request's stats object.
+current_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("current_db_stats", default=None)
+
+
+# -------------------------
+# Filter shapes
+# -------------------------
+def query_shape(value: Any) -> Any:
+    """Replace every literal in a filter with "?", keeping field names and operators"""
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $in lists and pipelines: one entry per distinct shape
+        shapes = []
+        for item in value:
+            shape = query_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+
+def command_shape(command_name: str, command: dict) -> Tuple[str, Any]:
+    """(collection, shape) of the part of a command that drives index selection"""
+    collection = command.get(command_name)
+    if command_name == "find":
+        shape = {"filter": query_shape(command.get("filter", {})), "sort": command.get("sort")}
+    elif command_name == "aggregate":
+        shape = query_shape(command.get("pipeline", []))
+    elif command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        shape = query_shape(statements[0].get("q", {}))
+    elif command_name in ("findAndModify", "count", "distinct"):
+        shape = {"query": query_shape(command.get("query", {})), "sort": command.get("sort")}
+    else:
+        shape = None
+    return (collection if isinstance(collection, str) else "", shape)
+
+
+# -------------------------
+# Listener
+# -------------------------
+class DbCommandMonitor(monitoring.CommandListener):
+    """
+    Attributes every command to the current request and logs slow ones.
+
+    The command document is only available in started(), so it is kept
+    until the command finishes and shaped only if it turned out slow.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[Any, int], Tuple[str, dict]] = {}
+
+    def started(self, event):
+        if MONGO_SLOW_COMMAND_MS <= 0:
+            return
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (event.command_name, event.command)
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+    def _finished(self, event, failed: bool) -> None:
+        stats = current_db_stats.get()
+        if stats is not None:
+            stats.add(event.command_name, event.duration_micros)
+
+        if MONGO_SLOW_COMMAND_MS <= 0:
+            return
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        duration_ms = event.duration_micros / 1000
+        if pending is None or duration_ms < MONGO_SLOW_COMMAND_MS:
+            return
+        command_name, command = pending
+        collection, shape = command_shape(command_name, command)
+        logger.warning(
+            f"Slow MongoDB command: {command_name} on {collection} took {duration_ms:.1f}ms"
+            f"{' (failed)' if failed else ''} shape={shape}"
+        )
+
+
+db_command_monitor = DbCommandMonitor()
+
+
+# -------------------------
+# Middleware
+# -------------------------
+class DbStatsMiddleware:
+    """
+    Gives each request its own command counter and reports it in the
+    db_* metrics, the log past MONGO_REQUEST_COMMANDS_WARN commands and,
+    with DB_STATS_HEADERS on, the X-DB-Commands / X-DB-Time-ms headers.
+
+    Headers go out with the response start, so commands issued while a
+    streaming body is sent are only in the metrics and the log.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestDbStats()
+        token = current_db_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and DB_STATS_HEADERS:
+                message["headers"] = list(message.get("headers", [])) + [
+                    (DB_COMMANDS_HEADER.lower().encode("latin-1"), str(stats.commands).encode("latin-1")),
+                    (DB_TIME_HEADER.lower().encode("latin-1"), f"{stats.duration_ms:.1f}".encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_db_stats.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            DB_COMMANDS_PER_REQUEST.observe(stats.commands, route=route)
+            DB_TIME_SECONDS.inc(stats.duration_micros / 1e6, route=route)
+            if MONGO_REQUEST_COMMANDS_WARN and stats.commands >= MONGO_REQUEST_COMMANDS_WARN:
+                logger.warning(
+                    f"{scope['method']} {route} issued {stats.commands} MongoDB commands "
+                    f"({stats.duration_ms:.1f}ms in DB, {(time.perf_counter() - started) * 1000:.1f}ms total): "
+                    f"{stats.by_command}"
+                )
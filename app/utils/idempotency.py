@@ -0,0 +1,122 @@
+# app/utils/idempotency.py
+import os
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+import orjson
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+
+# How long a key is remembered (a TTL index on created_at expires it)
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+# A request still "in progress" after this long (worker crashed) may be retried
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 60))
+
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_DONE = "done"
+
+
+def fingerprint(scope: str, payload: Any) -> str:
+    """Stable digest of what a request asks for, to detect a key reused for another request"""
+    body = orjson.dumps(jsonable_encoder(payload), option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(scope.encode("utf-8") + b"\0" + body).hexdigest()
+
+
+async def _claim(db: AsyncIOMotorDatabase, record_id: str, digest: str) -> Optional[dict]:
+    """
+    Take the key for this request. Returns None when the caller owns it and
+    must run the handler, or the existing record when someone else does.
+    """
+    now = datetime.utcnow()
+    keys = db[IDEMPOTENCY_COLLECTION]
+    try:
+        await keys.insert_one({
+            "_id": record_id,
+            "fingerprint": digest,
+            "status": STATUS_IN_PROGRESS,
+            "locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+            "created_at": now
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+
+    # Take over an abandoned attempt; the fingerprint must still match
+    taken = await keys.find_one_and_update(
+        {"_id": record_id, "fingerprint": digest, "status": STATUS_IN_PROGRESS, "locked_until": {"$lte": now}},
+        {"$set": {"locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)}},
+        return_document=ReturnDocument.AFTER
+    )
+    if taken:
+        return None
+
+    existing = await keys.find_one({"_id": record_id})
+    if existing is None:
+        # Expired between our insert and read: treat as a first request
+        return await _claim(db, record_id, digest)
+    return existing
+
+
+async def run(
+    db: AsyncIOMotorDatabase,
+    key: Optional[str],
+    user: dict,
+    scope: str,
+    payload: Any,
+    handler: Callable[[], Awaitable[Any]]
+) -> Any:
+    """
+    Run `handler` at most once per (user, scope, Idempotency-Key).
+
+    A retry with the same key and payload gets the stored response, marked
+    with the Idempotent-Replayed header, without repeating any write. The
+    same key with a different payload is rejected with 422, and a retry
+    that arrives while the first attempt is still running gets 409. If the
+    handler raises, the key is released so the client can try again.
+    Requests without a key run as before.
+    """
+    if not key:
+        return await handler()
+
+    record_id = f"{scope}:{user['_id']}:{key}"
+    digest = fingerprint(scope, payload)
+    existing = await _claim(db, record_id, digest)
+    if existing is not None:
+        if existing["fingerprint"] != digest:
+            raise HTTPException(status_code=422, detail=f"{IDEMPOTENCY_HEADER} was already used for a different request")
+        if existing["status"] != STATUS_DONE:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        return JSONResponse(
+            content=existing["response"]["body"],
+            status_code=existing["response"]["status_code"],
+            headers={REPLAYED_HEADER: "true"}
+        )
+
+    try:
+        result = await handler()
+    except Exception:
+        await db[IDEMPOTENCY_COLLECTION].delete_one({"_id": record_id, "status": STATUS_IN_PROGRESS})
+        raise
+
+    body = jsonable_encoder(result)
+    try:
+        await db[IDEMPOTENCY_COLLECTION].update_one(
+            {"_id": record_id},
+            {"$set": {"status": STATUS_DONE, "response": {"status_code": 200, "body": body}},
+             "$unset": {"locked_until": ""}}
+        )
+    except Exception as e:
+        # The writes already happened; a lost record only means a retry is not deduplicated
+        logger.error(f"Could not store idempotent response for {record_id}: {e}")
+    return result
@@ -0,0 +1,15 @@
+# app/utils/ids.py
+from bson import ObjectId
+
+UPI_ORDER_PREFIX = "UPI"
+
+
+def new_upi_order_id() -> str:
+    """
+    Collision-free UPI order reference, e.g. UPI65F1C2A9E4B0C81D2A3F9B10.
+
+    The suffix is a fresh ObjectId: a timestamp, a per-process random value
+    and a counter. It is unique across worker processes without any
+    coordination, and it sorts by creation time.
+    """
+    return UPI_ORDER_PREFIX + str(ObjectId()).upper()
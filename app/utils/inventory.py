@@ -0,0 +1,130 @@
+# app/utils/inventory.py
+from typing import Dict, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+
+# Fields every order path needs from the reserved product
+RESERVATION_PROJECTION = {"name": 1, "price": 1, "stock": 1, "vendor_id": 1}
+
+
+class StockError(Exception):
+    """Base class for stock reservation failures"""
+
+
+class InvalidQuantity(StockError):
+    pass
+
+
+class ProductNotFound(StockError):
+    pass
+
+
+class InsufficientStock(StockError):
+    pass
+
+
+def to_object_id(product_id) -> ObjectId:
+    if isinstance(product_id, ObjectId):
+        return product_id
+    try:
+        return ObjectId(product_id)
+    except (InvalidId, TypeError):
+        raise ProductNotFound("Product not found")
+
+
+async def reserve_stock(db: AsyncIOMotorDatabase, product_id, quantity: float) -> dict:
+    """
+    Atomically take `quantity` units of a product in one round trip.
+
+    The stock check and the decrement happen in a single conditional
+    find_one_and_update, so concurrent buyers can never oversell. Returns the
+    product as it is after the reservation.
+    """
+    if quantity is None or quantity <= 0:
+        raise InvalidQuantity("Quantity must be greater than zero")
+
+    oid = to_object_id(product_id)
+    product = await db["products"].find_one_and_update(
+        {"_id": oid, "stock": {"$gte": quantity}},
+        {"$inc": {"stock": -quantity}},
+        projection=RESERVATION_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
+    if product is not None:
+        return product
+
+    # Only the failure path pays for a second lookup, to pick the right error
+    if await db["products"].find_one({"_id": oid}, {"_id": 1}) is None:
+        raise ProductNotFound("Product not found")
+    raise InsufficientStock("Not enough stock")
+
+
+async def release_stock(db: AsyncIOMotorDatabase, product_id, quantity: float) -> None:
+    """Give back stock taken by reserve_stock (e.g. when the order insert fails)"""
+    await db["products"].update_one(
+        {"_id": to_object_id(product_id)},
+        {"$inc": {"stock": quantity}},
+    )
+
+
+def remaining_stock(product: Optional[dict]) -> int:
+    stock = (product or {}).get("stock", 0)
+    return int(stock) if isinstance(stock, float) else stock
+
+
+# -------------------------
+# Multi-line reservations
+# -------------------------
+# Each product touched by a bulk reservation carries the reservation token
+# until the order documents are written, so a partial failure can give back
+# exactly the lines that were taken and nothing else.
+RESERVATION_FIELD = "pending_reservations"
+
+
+async def reserve_many(db: AsyncIOMotorDatabase, lines: Dict[ObjectId, float]) -> ObjectId:
+    """
+    Reserve stock for several products in a single bulk_write.
+
+    All-or-nothing: if any line cannot be satisfied the lines that were
+    taken are released again and InsufficientStock is raised. Returns the
+    reservation token to pass to commit_many/release_many.
+    """
+    if any(q is None or q <= 0 for q in lines.values()):
+        raise InvalidQuantity("Quantity must be greater than zero")
+
+    token = ObjectId()
+    ops = [
+        UpdateOne(
+            {"_id": pid, "stock": {"$gte": qty}},
+            {"$inc": {"stock": -qty}, "$push": {RESERVATION_FIELD: token}},
+        )
+        for pid, qty in lines.items()
+    ]
+    result = await db["products"].bulk_write(ops, ordered=False)
+    if result.modified_count != len(ops):
+        await release_many(db, lines, token)
+        raise InsufficientStock("Not enough stock for one or more items")
+    return token
+
+
+async def commit_many(db: AsyncIOMotorDatabase, lines: Dict[ObjectId, float], token: ObjectId) -> None:
+    """Make a bulk reservation permanent once the orders are stored"""
+    await db["products"].update_many(
+        {"_id": {"$in": list(lines)}},
+        {"$pull": {RESERVATION_FIELD: token}},
+    )
+
+
+async def release_many(db: AsyncIOMotorDatabase, lines: Dict[ObjectId, float], token: ObjectId) -> None:
+    """Give back every line still holding `token`; lines that were never taken are left alone"""
+    ops = [
+        UpdateOne(
+            {"_id": pid, RESERVATION_FIELD: token},
+            {"$inc": {"stock": qty}, "$pull": {RESERVATION_FIELD: token}},
+        )
+        for pid, qty in lines.items()
+    ]
+    if ops:
+        await db["products"].bulk_write(ops, ordered=False)
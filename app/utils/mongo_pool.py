@@ -0,0 +1,104 @@
+# app/utils/mongo_pool.py
+import importlib.util
+import threading
+from typing import List
+from pymongo import monitoring
+
+# Wire compressors in order of preference, each usable only if its library is installed
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+def available_compressors(requested: str) -> List[str]:
+    """Filter a comma-separated compressor list down to what this interpreter supports"""
+    names = [c.strip().lower() for c in requested.split(",") if c.strip()]
+    return [
+        name for name in names
+        if name in _COMPRESSOR_MODULES and importlib.util.find_spec(_COMPRESSOR_MODULES[name]) is not None
+    ]
+
+
+class PoolTelemetry(monitoring.ConnectionPoolListener):
+    """
+    Connection pool counters fed by pymongo pool events.
+
+    Events arrive on Motor's executor threads, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connections_open = 0
+        self.in_use = 0
+        self.in_use_max = 0
+        self.checkouts_total = 0
+        self.checkout_failures_total = 0
+        self.checkout_wait_seconds_total = 0.0
+        self.checkout_wait_seconds_max = 0.0
+        self.pool_cleared_total = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_cleared_total += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures_total += 1
+            self._record_wait(getattr(event, "duration", None))
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts_total += 1
+            self.in_use += 1
+            self.in_use_max = max(self.in_use_max, self.in_use)
+            self._record_wait(getattr(event, "duration", None))
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def _record_wait(self, duration) -> None:
+        # `duration` (seconds spent waiting for a connection) exists on pymongo >= 4.7
+        if duration is None:
+            return
+        self.checkout_wait_seconds_total += duration
+        self.checkout_wait_seconds_max = max(self.checkout_wait_seconds_max, duration)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            checkouts = self.checkouts_total
+            return {
+                "connections_open": self.connections_open,
+                "in_use": self.in_use,
+                "in_use_max": self.in_use_max,
+                "checkouts_total": checkouts,
+                "checkout_failures_total": self.checkout_failures_total,
+                "checkout_wait_seconds_total": self.checkout_wait_seconds_total,
+                "checkout_wait_seconds_max": self.checkout_wait_seconds_max,
+                "checkout_wait_seconds_avg": self.checkout_wait_seconds_total / checkouts if checkouts else 0.0,
+                "pool_cleared_total": self.pool_cleared_total,
+            }
+
+
+pool_telemetry = PoolTelemetry()
@@ -0,0 +1,235 @@
+# app/utils/notifications.py
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from app.utils.twilio_utils import PermanentSendError, send_whatsapp
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "notification_outbox"
+
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", 4))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", 5))
+NOTIFY_BACKOFF_BASE_SECONDS = float(os.getenv("NOTIFY_BACKOFF_BASE_SECONDS", 5))
+NOTIFY_BACKOFF_MAX_SECONDS = float(os.getenv("NOTIFY_BACKOFF_MAX_SECONDS", 600))
+NOTIFY_POLL_INTERVAL_SECONDS = float(os.getenv("NOTIFY_POLL_INTERVAL_SECONDS", 2))
+# A message stuck in "sending" longer than this (worker crashed) is picked up again
+NOTIFY_LEASE_SECONDS = int(os.getenv("NOTIFY_LEASE_SECONDS", 60))
+# Delivered and dead-lettered messages (phone numbers, addresses) are removed
+# by TTL indexes after these retention periods
+NOTIFY_SENT_RETENTION_SECONDS = int(os.getenv("NOTIFY_SENT_RETENTION_SECONDS", 7 * 24 * 3600))
+NOTIFY_DEAD_RETENTION_SECONDS = int(os.getenv("NOTIFY_DEAD_RETENTION_SECONDS", 30 * 24 * 3600))
+
+# Outbox document lifecycle: pending -> sending -> sent
+#                                           \-> pending (retry with backoff) -> ... -> dead
+#                                           \-> dead (permanent failure, no retries)
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_DEAD = "dead"
+
+
+# -------------------------
+# Producer side
+# -------------------------
+_wakeup: Optional[asyncio.Event] = None
+
+
+def _wakeup_event() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+
+async def enqueue_whatsapp(db: AsyncIOMotorDatabase, to: Optional[str], message: str) -> bool:
+    """
+    Queue a WhatsApp message for background delivery.
+
+    The message is written to the outbox collection, so it survives a
+    restart; the caller only pays for one insert. Returns True if queued.
+    """
+    if not to:
+        return False
+
+    now = datetime.utcnow()
+    await db[OUTBOX_COLLECTION].insert_one({
+        "channel": "whatsapp",
+        "to": to,
+        "body": message,
+        "status": STATUS_PENDING,
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+        "updated_at": now
+    })
+    _wakeup_event().set()
+    return True
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff after `attempts` failed deliveries"""
+    return min(NOTIFY_BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), NOTIFY_BACKOFF_MAX_SECONDS)
+
+
+# -------------------------
+# Consumer side
+# -------------------------
+class NotificationWorkerPool:
+    """Bounded pool of asyncio workers draining the notification outbox"""
+
+    def __init__(self, db: AsyncIOMotorDatabase, workers: int = NOTIFY_WORKERS):
+        self.db = db
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = False
+        self.in_flight = 0
+        self.sent_total = 0
+        self.failed_total = 0
+        self.dead_total = 0
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._run(i)) for i in range(self.workers)]
+        logger.info(f"Notification outbox started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await self.db[OUTBOX_COLLECTION].find_one_and_update(
+            {"$or": [
+                {"status": STATUS_PENDING, "next_attempt_at": {"$lte": now}},
+                {"status": STATUS_SENDING, "lease_until": {"$lte": now}}
+            ]},
+            {
+                "$set": {
+                    "status": STATUS_SENDING,
+                    "lease_until": now + timedelta(seconds=NOTIFY_LEASE_SECONDS),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _run(self, worker_id: int) -> None:
+        wakeup = _wakeup_event()
+        while not self._stopping:
+            try:
+                doc = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification worker {worker_id} failed to claim: {e}")
+                doc = None
+
+            if doc is None:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=NOTIFY_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                wakeup.clear()
+                continue
+
+            self.in_flight += 1
+            try:
+                await self._deliver(doc)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification worker {worker_id} failed on {doc['_id']}: {e}")
+            finally:
+                self.in_flight -= 1
+
+    async def _deliver(self, doc: dict) -> None:
+        # One attempt per claim: retries are spread out by the backoff schedule
+        try:
+            ok = await send_whatsapp(doc["to"], doc["body"], retries=1, delay=0, raise_permanent=True)
+        except PermanentSendError as e:
+            self.failed_total += 1
+            await self._dead_letter(doc, str(e))
+            return
+        now = datetime.utcnow()
+        outbox = self.db[OUTBOX_COLLECTION]
+
+        if ok:
+            self.sent_total += 1
+            await outbox.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {"status": STATUS_SENT, "sent_at": now, "updated_at": now},
+                 "$unset": {"lease_until": ""}}
+            )
+            return
+
+        self.failed_total += 1
+        if doc["attempts"] >= NOTIFY_MAX_ATTEMPTS:
+            await self._dead_letter(doc, f"gave up after {doc['attempts']} attempts")
+            return
+
+        await outbox.update_one(
+            {"_id": doc["_id"]},
+            {"$set": {
+                "status": STATUS_PENDING,
+                "next_attempt_at": now + timedelta(seconds=backoff_seconds(doc["attempts"])),
+                "updated_at": now
+            },
+             "$unset": {"lease_until": ""}}
+        )
+
+    async def _dead_letter(self, doc: dict, reason: str) -> None:
+        self.dead_total += 1
+        logger.error(f"Notification {doc['_id']} to {doc['to']} dead-lettered: {reason}")
+        now = datetime.utcnow()
+        await self.db[OUTBOX_COLLECTION].update_one(
+            {"_id": doc["_id"]},
+            {"$set": {"status": STATUS_DEAD, "dead_at": now, "error": reason, "updated_at": now},
+             "$unset": {"lease_until": ""}}
+        )
+
+
+_pool: Optional[NotificationWorkerPool] = None
+
+
+async def start_notification_workers(db: AsyncIOMotorDatabase) -> None:
+    """Start the outbox worker pool on startup"""
+    global _pool
+    if _pool is None:
+        _pool = NotificationWorkerPool(db)
+        await _pool.start()
+
+
+async def stop_notification_workers() -> None:
+    """Stop the outbox worker pool on shutdown; undelivered messages stay queued"""
+    global _pool
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
+
+
+async def get_outbox_stats(db: AsyncIOMotorDatabase) -> dict:
+    """Queue depth and delivery counters for monitoring"""
+    outbox = db[OUTBOX_COLLECTION]
+    now = datetime.utcnow()
+    return {
+        "pending": await outbox.count_documents({"status": STATUS_PENDING}),
+        "due": await outbox.count_documents({"status": STATUS_PENDING, "next_attempt_at": {"$lte": now}}),
+        "sending": await outbox.count_documents({"status": STATUS_SENDING}),
+        "dead": await outbox.count_documents({"status": STATUS_DEAD}),
+        "workers": _pool.workers if _pool else 0,
+        "in_flight": _pool.in_flight if _pool else 0,
+        "sent_total": _pool.sent_total if _pool else 0,
+        "failed_total": _pool.failed_total if _pool else 0,
+        "dead_total": _pool.dead_total if _pool else 0
+    }
@@ -0,0 +1,239 @@
+# app/utils/ratelimit.py
+import os
+import json
+import math
+import time
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.utils.cache import REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+# Backend selection: "memory" (default, per process) or "redis" (shared by all workers)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 10000))
+
+
+# -------------------------
+# Policies
+# -------------------------
+class RateLimitPolicy:
+    """
+    Token bucket for one route: `capacity` requests in a burst, refilled
+    at `capacity / period` tokens per second, counted per identity.
+
+    `identity` is "ip" (client address) or "user" (the bearer token's
+    subject, falling back to the address for anonymous requests).
+    """
+
+    def __init__(self, name: str, method: str, path: str, capacity: int, period: float, identity: str = "ip"):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.capacity = capacity
+        self.period = period
+        self.identity = identity
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+    def matches(self, method: str, path: str) -> bool:
+        return method == self.method and path.rstrip("/") == self.path
+
+
+def policy_from_env(name: str, method: str, path: str, default: str, identity: str = "ip") -> Optional[RateLimitPolicy]:
+    """Build a policy from RATE_LIMIT_<NAME>="<requests>/<seconds>"; "off" disables it"""
+    spec = os.getenv(f"RATE_LIMIT_{name.upper()}", default).strip().lower()
+    if spec in ("", "off", "0"):
+        return None
+    capacity, _, period = spec.partition("/")
+    return RateLimitPolicy(name, method, path, int(capacity), float(period or 60), identity)
+
+
+def default_policies() -> List[RateLimitPolicy]:
+    policies = [
+        # bcrypt makes every login and signup expensive: limit per client address
+        policy_from_env("login", "POST", "/api/users/login", "10/60"),
+        policy_from_env("signup", "POST", "/api/users/signup", "5/3600"),
+        policy_from_env("orders", "POST", "/api/store/orders", "30/60", identity="user"),
+        policy_from_env("checkout", "POST", "/api/store/orders/checkout", "30/60", identity="user"),
+    ]
+    return [p for p in policies if p is not None]
+
+
+# -------------------------
+# Backends
+# -------------------------
+class RateLimiter:
+    """Token bucket store. take() returns (allowed, seconds until a token is available)"""
+
+    async def take(self, key: str, capacity: int, rate: float) -> Tuple[bool, float]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        return None
+
+
+class MemoryRateLimiter(RateLimiter):
+    """Per-process buckets; with N workers a client effectively gets N buckets"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, capacity: int, rate: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        # Evicting the least recently seen bucket only ever makes a client look fresh
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+# Refill, take and store one bucket atomically, using the Redis clock so all
+# workers agree on time. Returns {allowed, retry_after_ms}.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+local allowed = 0
+local retry_ms = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+else
+  retry_ms = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return {allowed, retry_ms}
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    """Buckets shared across worker processes.
+
+    Redis errors are logged and the request is let through: losing the
+    limiter must not take the API down with it.
+    """
+
+    def __init__(self, url: str = REDIS_URL):
+        import redis.asyncio as redis_asyncio
+
+        self._redis = redis_asyncio.from_url(url)
+        self._script = self._redis.register_script(TOKEN_BUCKET_LUA)
+
+    async def take(self, key: str, capacity: int, rate: float) -> Tuple[bool, float]:
+        try:
+            allowed, retry_ms = await self._script(keys=[f"ratelimit:{key}"], args=[capacity, rate])
+        except Exception as e:
+            logger.warning(f"Redis rate limit check failed for {key}: {e}")
+            return True, 0.0
+        return bool(allowed), int(retry_ms) / 1000
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter, creating it on first use"""
+    global _limiter
+    if _limiter is None:
+        if RATE_LIMIT_BACKEND == "redis":
+            _limiter = RedisRateLimiter()
+        else:
+            _limiter = MemoryRateLimiter()
+    return _limiter
+
+
+async def close_rate_limiter() -> None:
+    """Close the rate limiter backend on shutdown"""
+    global _limiter
+    if _limiter is not None:
+        await _limiter.close()
+        _limiter = None
+
+
+# -------------------------
+# Middleware
+# -------------------------
+def _bearer_subject(headers: dict) -> Optional[str]:
+    """User id from the bearer token, without touching the database"""
+    from app.auth import decode_access_token
+
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return decode_access_token(token).get("sub")
+    except Exception:
+        return None
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware rejecting requests over their route's budget with 429
+    and Retry-After, before routing, body parsing or any handler work.
+
+    The client address comes from the ASGI scope; behind a proxy run
+    uvicorn with --proxy-headers so it reflects X-Forwarded-For.
+    """
+
+    def __init__(self, app, policies: Optional[List[RateLimitPolicy]] = None, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.policies = default_policies() if policies is None else policies
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        policy = next((p for p in self.policies if p.matches(scope["method"], scope["path"])), None)
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        identity = f"ip:{client[0] if client else 'unknown'}"
+        if policy.identity == "user":
+            subject = _bearer_subject(dict(scope.get("headers") or []))
+            if subject:
+                identity = f"user:{subject}"
+
+        limiter = self.limiter or get_rate_limiter()
+        allowed, retry_after = await limiter.take(f"{policy.name}:{identity}", policy.capacity, policy.rate)
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": "Too many requests, please retry later"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
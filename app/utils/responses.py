@@ -0,0 +1,49 @@
+# app/utils/responses.py
+import os
+import hashlib
+from typing import Any, Optional
+import orjson
+from fastapi import Request, Response
+
+# Browser/CDN caching for catalog responses; revalidation uses the ETag
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", 30))
+CATALOG_STALE_WHILE_REVALIDATE = int(os.getenv("CATALOG_STALE_WHILE_REVALIDATE", 300))
+CATALOG_CACHE_CONTROL = f"public, max-age={CATALOG_MAX_AGE}, stale-while-revalidate={CATALOG_STALE_WHILE_REVALIDATE}"
+
+
+def render_json(content: Any) -> str:
+    """Serialize already-validated content with orjson"""
+    return orjson.dumps(content).decode("utf-8")
+
+
+def json_response(body: str, headers: Optional[dict] = None, status_code: int = 200) -> Response:
+    """
+    Send a pre-rendered JSON body.
+
+    Returning a Response makes FastAPI skip response_model validation and
+    encoding, so content validated once upstream is not validated again.
+    """
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+def make_etag(body: str) -> str:
+    """Strong ETag derived from the exact response bytes"""
+    return '"' + hashlib.blake2b(body.encode("utf-8"), digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so a W/ prefix is ignored"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (c.strip() for c in if_none_match.split(","))
+    return any((c[2:] if c.startswith("W/") else c) == etag for c in candidates)
+
+
+def conditional_json_response(request: Request, body: str, etag: str, headers: Optional[dict] = None) -> Response:
+    """Send a catalog body with caching headers, or 304 if the client already has it"""
+    headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL, **(headers or {})}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return json_response(body, headers=headers)
@@ -0,0 +1,172 @@
+# app/utils/rollups.py
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+DAILY_SALES_COLLECTION = "daily_sales"
+
+# -------------------------
+# Buckets
+# -------------------------
+# One document per (vendor_id, day). Orders are bucketed by the UTC day they
+# were placed, so a payment confirmed after midnight still lands on the day
+# of its order and a rebuild from `orders` produces the same buckets.
+
+
+def bucket_day(moment: datetime) -> datetime:
+    """Midnight of the day containing `moment` (BSON has no date-only type)"""
+    return datetime.combine(moment.date(), time.min)
+
+
+def order_total(order: dict) -> float:
+    # Orders written by crud.create_order store the amount as total_price
+    return order.get("total", order.get("total_price")) or 0
+
+
+def _bucket_increments(orders: Iterable[dict], fields) -> Dict[Tuple[str, datetime], Dict[str, float]]:
+    buckets: Dict[Tuple[str, datetime], Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    for order in orders:
+        if not order.get("vendor_id") or not order.get("created_at"):
+            continue
+        inc = buckets[(order["vendor_id"], bucket_day(order["created_at"]))]
+        for field, value in fields(order):
+            inc[field] += value
+    return buckets
+
+
+async def _apply(db: AsyncIOMotorDatabase, buckets: Dict[Tuple[str, datetime], Dict[str, float]]) -> None:
+    if not buckets:
+        return
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne(
+            {"vendor_id": vendor_id, "day": day},
+            {"$inc": dict(inc), "$set": {"updated_at": now}},
+            upsert=True
+        )
+        for (vendor_id, day), inc in buckets.items()
+    ]
+    try:
+        await db[DAILY_SALES_COLLECTION].bulk_write(ops, ordered=False)
+    except Exception as e:
+        # Rollups are derived data: never fail an order over them, a rebuild repairs the drift
+        logger.error(f"Could not update {DAILY_SALES_COLLECTION} ({len(ops)} buckets): {e}")
+
+
+async def record_orders_placed(db: AsyncIOMotorDatabase, orders: List[dict]) -> None:
+    """Add freshly inserted orders to their vendors' daily buckets"""
+    await _apply(db, _bucket_increments(orders, lambda o: (
+        ("orders", 1),
+        ("units", o.get("quantity") or 0),
+        ("revenue", order_total(o)),
+    )))
+
+
+async def record_orders_paid(db: AsyncIOMotorDatabase, orders: List[dict]) -> None:
+    """Add orders that just became paid to their vendors' daily buckets"""
+    await _apply(db, _bucket_increments(orders, lambda o: (
+        ("paid_orders", 1),
+        ("paid_revenue", order_total(o)),
+    )))
+
+
+async def mark_orders_paid(db: AsyncIOMotorDatabase, order_oids: List[ObjectId], now: Optional[datetime] = None) -> List[dict]:
+    """
+    Move orders to paid/confirmed and count them in the rollups.
+
+    Only orders that were not paid yet are updated and tagged with a
+    per-call token; reading them back by that token yields exactly the
+    orders this call transitioned, so a repeated or concurrent confirmation
+    never counts the same order twice. Returns the transitioned orders.
+    """
+    now = now or datetime.utcnow()
+    token = ObjectId()
+    await db["orders"].update_many(
+        {"_id": {"$in": order_oids}, "payment_status": {"$ne": "paid"}},
+        {"$set": {"payment_status": "paid", "status": "confirmed", "updated_at": now, "paid_token": token}}
+    )
+    paid = await db["orders"].find({"_id": {"$in": order_oids}, "paid_token": token}).to_list(length=len(order_oids))
+    await record_orders_paid(db, paid)
+    return paid
+
+
+# -------------------------
+# Rebuild
+# -------------------------
+def rebuild_pipeline(match: dict, stamp: datetime) -> List[dict]:
+    """Aggregate `orders` into daily buckets and $merge them over daily_sales"""
+    total = {"$ifNull": ["$total", {"$ifNull": ["$total_price", 0]}]}
+    is_paid = {"$eq": ["$payment_status", "paid"]}
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "vendor_id": "$vendor_id",
+                "day": {"$dateFromString": {
+                    "dateString": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                    "format": "%Y-%m-%d"
+                }}
+            },
+            "orders": {"$sum": 1},
+            "units": {"$sum": {"$ifNull": ["$quantity", 0]}},
+            "revenue": {"$sum": total},
+            "paid_orders": {"$sum": {"$cond": [is_paid, 1, 0]}},
+            "paid_revenue": {"$sum": {"$cond": [is_paid, total, 0]}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "vendor_id": "$_id.vendor_id",
+            "day": "$_id.day",
+            "orders": 1,
+            "units": 1,
+            "revenue": 1,
+            "paid_orders": 1,
+            "paid_revenue": 1,
+            "updated_at": {"$literal": stamp},
+        }},
+        {"$merge": {
+            "into": DAILY_SALES_COLLECTION,
+            "on": ["vendor_id", "day"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }},
+    ]
+
+
+async def rebuild_daily_sales(db: AsyncIOMotorDatabase, start: Optional[date] = None, end: Optional[date] = None) -> dict:
+    """
+    Recompute the buckets for [start, end] (whole history by default) from `orders`.
+
+    Buckets are replaced in place rather than dropped first, so readers
+    never see an empty range. Buckets in the range that the rebuild did not
+    write (their orders are gone) are removed afterwards. Orders placed
+    while the rebuild runs may be counted twice or missed in their bucket;
+    run it off-peak, or simply again.
+    """
+    now = datetime.utcnow()
+    # BSON dates keep milliseconds; the stamp must survive the round trip
+    stamp = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    match: dict = {"vendor_id": {"$type": "string"}, "created_at": {"$type": "date"}}
+    day_range: dict = {}
+    if start:
+        day_range["$gte"] = datetime.combine(start, time.min)
+    if end:
+        day_range["$lt"] = datetime.combine(end + timedelta(days=1), time.min)
+    if day_range:
+        match["created_at"] = {**match["created_at"], **day_range}
+
+    await db["orders"].aggregate(rebuild_pipeline(match, stamp)).to_list(length=None)
+
+    stale = {"updated_at": {"$lt": stamp}}
+    if day_range:
+        stale["day"] = day_range
+    removed = await db[DAILY_SALES_COLLECTION].delete_many(stale)
+    buckets = await db[DAILY_SALES_COLLECTION].count_documents({"updated_at": stamp})
+    logger.info(f"Rebuilt {buckets} {DAILY_SALES_COLLECTION} buckets, removed {removed.deleted_count} stale")
+    return {"buckets": buckets, "removed": removed.deleted_count, "rebuilt_at": stamp}
@@ -0,0 +1,108 @@
+# app/utils/search.py
+import os
+import re
+import math
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+# Rebuild at least this often, so writes handled by other workers show up
+# even when the catalog generation is per process (memory cache); 0 disables
+SEARCH_INDEX_TTL_SECONDS = int(os.getenv("SEARCH_INDEX_TTL_SECONDS", 60))
+
+# Same relative weights as the Mongo text index on products
+FIELD_WEIGHTS = {"name": 10, "description": 2}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class ProductSearchIndex:
+    """
+    In-process inverted index over product name and description.
+
+    Used when the Mongo text index is unavailable. Product write endpoints
+    call upsert/remove so this worker sees its own writes immediately; the
+    index is rebuilt from MongoDB when the catalog generation changes or
+    after SEARCH_INDEX_TTL_SECONDS, which picks up other workers' writes.
+    """
+
+    def __init__(self):
+        # term -> {product_id: weighted term frequency}
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        # product_id -> terms, so a product can be removed or replaced
+        self._terms: Dict[str, set] = {}
+        self.loaded = False
+        self.generation: Optional[int] = None
+        self.loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def upsert(self, product_id, name: Optional[str], description: Optional[str]) -> None:
+        product_id = str(product_id)
+        self.remove(product_id)
+        weights: Dict[str, float] = defaultdict(float)
+        for field, text in (("name", name), ("description", description)):
+            for term in tokenize(text):
+                weights[term] += FIELD_WEIGHTS[field]
+        for term, weight in weights.items():
+            self._postings[term][product_id] = weight
+        self._terms[product_id] = set(weights)
+
+    def remove(self, product_id) -> None:
+        product_id = str(product_id)
+        for term in self._terms.pop(product_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Product ids matching any query term, best tf-idf score first (all of them without a limit)"""
+        total = len(self._terms) or 1
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + total / len(postings))
+            for product_id, weight in postings.items():
+                scores[product_id] += weight * idf
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [product_id for product_id, _ in ranked[:limit]]
+
+    def _stale(self, generation: int) -> bool:
+        if not self.loaded or generation != self.generation:
+            return True
+        return bool(SEARCH_INDEX_TTL_SECONDS) and time.monotonic() - self.loaded_at > SEARCH_INDEX_TTL_SECONDS
+
+    async def ensure_loaded(self, db: AsyncIOMotorDatabase, generation: int = 0) -> None:
+        """(Re)build the index from the products collection when it is missing or stale"""
+        if not self._stale(generation):
+            return
+        async with self._lock:
+            if not self._stale(generation):
+                return
+            # Build aside and swap, so searches never see a half-built index
+            fresh = ProductSearchIndex()
+            async for p in db["products"].find({}, {"name": 1, "description": 1}):
+                fresh.upsert(p["_id"], p.get("name"), p.get("description"))
+            self._postings, self._terms = fresh._postings, fresh._terms
+            self.loaded = True
+            self.generation = generation
+            self.loaded_at = time.monotonic()
+        logger.info(f"In-process product search index built with {len(self)} products")
+
+
+product_search_index = ProductSearchIndex()
@@ -0,0 +1,71 @@
+# app/utils/streaming.py
+import os
+import logging
+from typing import Any, AsyncIterator, Callable, Literal
+import orjson
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorCursor
+
+logger = logging.getLogger(__name__)
+
+# Documents fetched per getMore and encoded per chunk: memory per stream is
+# bounded by one batch whatever the collection size
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 500))
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+StreamFormat = Literal["json", "ndjson"]
+
+
+async def encode_stream(
+    cursor: AsyncIOMotorCursor,
+    encode: Callable[[dict], Any],
+    fmt: StreamFormat = "json",
+    batch_size: int = STREAM_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    """
+    Encode documents as the cursor yields them.
+
+    "json" produces one JSON array, "ndjson" one document per line. Output
+    is flushed once per cursor batch so chunks stay reasonably large.
+    """
+    cursor.batch_size(batch_size)
+    ndjson = fmt == "ndjson"
+    if not ndjson:
+        yield b"["
+
+    chunk = []
+    count = 0
+    try:
+        async for doc in cursor:
+            item = orjson.dumps(encode(doc))
+            if ndjson:
+                chunk.append(item + b"\n")
+            else:
+                chunk.append(item if count == 0 else b"," + item)
+            count += 1
+            if len(chunk) >= batch_size:
+                yield b"".join(chunk)
+                chunk = []
+    except Exception as e:
+        # Headers are already sent: the best we can do is cut the body short
+        logger.error(f"Streaming aborted after {count} documents: {e}")
+        raise
+    finally:
+        await cursor.close()
+
+    if chunk:
+        yield b"".join(chunk)
+    if not ndjson:
+        yield b"]"
+
+
+def stream_response(
+    cursor: AsyncIOMotorCursor,
+    encode: Callable[[dict], Any],
+    fmt: StreamFormat = "json",
+    batch_size: int = STREAM_BATCH_SIZE
+) -> StreamingResponse:
+    """Chunked response over a Motor cursor, as a JSON array or NDJSON"""
+    media_type = NDJSON_MEDIA_TYPE if fmt == "ndjson" else "application/json"
+    return StreamingResponse(encode_stream(cursor, encode, fmt, batch_size), media_type=media_type)
@@ -4,6 +4,8 @@ import asyncio
 from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
 
+from app.utils.metrics import outbound_timer
+
 # Load credentials from environment
 TWILIO_SID = os.getenv("TWILIO_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
@@ -16,7 +18,24 @@ if all([TWILIO_SID, TWILIO_AUTH_TOKEN, TWILIO_WHATSAPP_NUMBER]):
 else:
     logging.warning("Twilio credentials missing - WhatsApp notifications disabled")
 
-async def send_whatsapp(to: str, message: str, retries: int = 3, delay: int = 5) -> bool:
+class PermanentSendError(Exception):
+    """The message can never be delivered as addressed: retrying will not help"""
+
+
+def _is_permanent(e: TwilioRestException) -> bool:
+    # 4xx means Twilio rejected the request itself (bad number, unverified
+    # sender, auth); timeouts, throttling and 5xx are worth retrying
+    return e.status is not None and 400 <= e.status < 500 and e.status not in (408, 429)
+
+
+def _skip(reason: str, raise_permanent: bool) -> bool:
+    logging.warning(reason)
+    if raise_permanent:
+        raise PermanentSendError(reason)
+    return False
+
+
+async def send_whatsapp(to: str, message: str, retries: int = 3, delay: int = 5, raise_permanent: bool = False) -> bool:
     """
     Send a WhatsApp message via Twilio with async retry.
     Returns True if successful, False otherwise.
@@ -25,34 +44,41 @@ async def send_whatsapp(to: str, message: str, retries: int = 3, delay: int = 5)
     :param message: Message text
     :param retries: Number of retries if sending fails
     :param delay: Seconds to wait between retries
+    :param raise_permanent: Raise PermanentSendError instead of returning False
+        when the failure is not retryable (no Twilio client, malformed number,
+        request rejected by Twilio)
     """
     if not to:
-        logging.warning("No recipient provided, skipping WhatsApp message.")
-        return False
+        return _skip("No recipient provided, skipping WhatsApp message.", raise_permanent)
 
     if not client:
-        logging.warning("Twilio client not initialized, skipping WhatsApp message.")
-        return False
+        return _skip("Twilio client not initialized, skipping WhatsApp message.", raise_permanent)
 
     # Validate WhatsApp number format
     if not to.startswith('whatsapp:+'):
-        logging.warning(f"Invalid WhatsApp number format: {to}. Should be 'whatsapp:+countrycodeNumber'")
-        return False
+        return _skip(
+            f"Invalid WhatsApp number format: {to}. Should be 'whatsapp:+countrycodeNumber'", raise_permanent
+        )
 
     for attempt in range(1, retries + 1):
         try:
             # Use asyncio.to_thread to make Twilio sync call async
-            message_obj = await asyncio.to_thread(
-                client.messages.create,
-                from_=TWILIO_WHATSAPP_NUMBER,
-                body=message,
-                to=to
-            )
+            with outbound_timer("twilio", "messages.create"):
+                message_obj = await asyncio.to_thread(
+                    client.messages.create,
+                    from_=TWILIO_WHATSAPP_NUMBER,
+                    body=message,
+                    to=to
+                )
             logging.info(f"WhatsApp message sent to {to} - SID: {message_obj.sid}")
             return True
             
         except TwilioRestException as e:
             logging.error(f"Twilio error (attempt {attempt}/{retries}) for {to}: {e}")
+            if _is_permanent(e):
+                if raise_permanent:
+                    raise PermanentSendError(f"Twilio rejected the message: {e.msg}") from e
+                return False
             if attempt < retries:
                 logging.info(f"Retrying in {delay} seconds...")
                 await asyncio.sleep(delay)
@@ -0,0 +1,426 @@
+# loadtest/run.py
+"""
+End-to-end HTTP load test for the ASGI app.
+
+Drives app.main:app in-process through an httpx AsyncClient, so no server
+or network is involved, against either an in-memory MongoDB stand-in
+(mongomock-motor, the default) or a local MongoDB (--mongo-url). Twilio
+and Cloudinary are stubbed. Results are written as JSON so runs from two
+commits can be diffed:
+
+    pip install -r loadtest/requirements.txt
+    python -m loadtest.run --output before.json
+    python -m loadtest.run --mongo-url mongodb://localhost:27017 --requests 2000
+
+Numbers from the in-memory stand-in measure the Python request path only;
+use a local MongoDB for anything involving query cost. With --mongo-url
+the harness works in its own database (--mongo-db), which is dropped first.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Settings the app reads at import time (they win over .env, but not over
+# the real environment). Rate limits would turn most of a single-client load
+# test into 429s, per-request logs would be stdout noise, and a shared Redis
+# cache would carry state between runs. The DB stats headers feed the
+# per-request command counts in the report.
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+os.environ.setdefault("CACHE_BACKEND", "memory")
+os.environ.setdefault("DB_STATS_HEADERS", "true")
+
+import httpx
+from bson import ObjectId
+
+from app import auth, database
+from app.main import app
+from app.utils import cloudinary_utils, twilio_utils
+from app.utils.notifications import start_notification_workers, stop_notification_workers
+
+PASSWORD = "LoadTest123"
+WHATSAPP = "whatsapp:+910000000000"
+SCENARIOS = ("browse", "login", "order_contention", "upi_confirm")
+
+
+# -------------------------
+# Stubs
+# -------------------------
+class _StubMessages:
+    def __init__(self):
+        self.sent = 0
+
+    def create(self, **kwargs):
+        self.sent += 1
+        return type("Message", (), {"sid": f"SM{ObjectId()}"})()
+
+
+class StubTwilioClient:
+    """Stands in for twilio.rest.Client: accepts every message, sends nothing"""
+
+    def __init__(self):
+        self.messages = _StubMessages()
+
+
+def stub_cloudinary_upload(file, **kwargs) -> dict:
+    return {"secure_url": f"https://res.cloudinary.invalid/{kwargs.get('public_id', 'image')}.jpg"}
+
+
+def install_stubs() -> StubTwilioClient:
+    twilio = StubTwilioClient()
+    twilio_utils.client = twilio
+    twilio_utils.TWILIO_WHATSAPP_NUMBER = "whatsapp:+10000000000"
+    cloudinary_utils.cloudinary.uploader.upload = stub_cloudinary_upload
+    return twilio
+
+
+# -------------------------
+# Database
+# -------------------------
+def _patch_mongomock() -> None:
+    # pymongo 4.9+ passes `sort` to bulk update operations; mongomock predates it
+    import mongomock.collection as mongomock_collection
+
+    add_update = mongomock_collection.BulkOperationBuilder.add_update
+    if getattr(add_update, "_loadtest_patched", False):
+        return
+
+    def _add_update(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    _add_update._loadtest_patched = True
+    mongomock_collection.BulkOperationBuilder.add_update = _add_update
+
+
+async def connect(mongo_url: Optional[str], mongo_db: str) -> str:
+    """Point app.database at the chosen backend; returns its name for the report"""
+    if not mongo_url:
+        from mongomock_motor import AsyncMongoMockClient
+
+        _patch_mongomock()
+        database.client = AsyncMongoMockClient()
+        database.db = database.client[mongo_db]
+        return "mongomock"
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.indexes import ensure_indexes
+
+    database.client = AsyncIOMotorClient(mongo_url, **database.client_options())
+    await database.client.drop_database(mongo_db)
+    database.db = database.client[mongo_db]
+    await ensure_indexes(database.db)
+    return "mongodb"
+
+
+async def seed(db, customers: int, products: int, contention_stock: int) -> dict:
+    """Users, one approved vendor with a catalog, and the contended product"""
+    password_hash = await auth.hash_password_async(PASSWORD)
+    now = datetime.utcnow()
+
+    vendor_user = await db["users"].insert_one({
+        "username": "loadtest-vendor", "email": "vendor@loadtest.example.com", "password": password_hash,
+        "mobile": "", "address": "", "role": "vendor"
+    })
+    vendor = await db["vendors"].insert_one({
+        "user_id": str(vendor_user.inserted_id), "shop_name": "Load Test Farm", "whatsapp": WHATSAPP,
+        "description": "Seeded by loadtest", "status": "approved", "created_at": now
+    })
+    vendor_id = vendor.inserted_id
+
+    result = await db["users"].insert_many([
+        {
+            "username": f"customer{i}", "email": f"customer{i}@loadtest.example.com", "password": password_hash,
+            "mobile": "9000000000", "address": "Load test lane", "role": "customer"
+        }
+        for i in range(customers)
+    ])
+    customer_ids = result.inserted_ids
+
+    result = await db["products"].insert_many([
+        {
+            "vendor_id": vendor_id, "name": f"Product {i}", "description": f"Seeded product number {i}",
+            "price": 10.0 + i % 50, "stock": 1_000_000, "image_url": None, "created_at": now
+        }
+        for i in range(products)
+    ])
+    product_ids = [str(oid) for oid in result.inserted_ids]
+
+    contended = await db["products"].insert_one({
+        "vendor_id": vendor_id, "name": "Contended product", "description": "Everyone wants this one",
+        "price": 25.0, "stock": contention_stock, "image_url": None, "created_at": now
+    })
+
+    return {
+        "vendor_id": str(vendor_id),
+        "customer_ids": [str(oid) for oid in customer_ids],
+        "customer_emails": [f"customer{i}@loadtest.example.com" for i in range(customers)],
+        "product_ids": product_ids,
+        "contended_product_id": str(contended.inserted_id),
+    }
+
+
+# -------------------------
+# Measurement
+# -------------------------
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Recorder:
+    """Latency, status codes and MongoDB command counts per operation"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.db_commands: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, op: str, send: Callable[[], Awaitable[httpx.Response]]) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await send()
+        except Exception:
+            self.errors[op] += 1
+            return None
+        finally:
+            self.latencies[op].append(time.perf_counter() - started)
+        self.statuses[op][response.status_code] += 1
+        self.db_commands[op] += int(response.headers.get("x-db-commands", 0))
+        return response
+
+    def summary(self, wall_seconds: float) -> dict:
+        operations = {}
+        for op, values in self.latencies.items():
+            values = sorted(values)
+            operations[op] = {
+                "requests": len(values),
+                "errors": self.errors[op],
+                "status_codes": {str(code): n for code, n in sorted(self.statuses[op].items())},
+                "throughput_rps": round(len(values) / wall_seconds, 2) if wall_seconds else None,
+                "latency_ms": {
+                    "mean": round(sum(values) / len(values) * 1000, 3),
+                    "p50": round(percentile(values, 50) * 1000, 3),
+                    "p95": round(percentile(values, 95) * 1000, 3),
+                    "p99": round(percentile(values, 99) * 1000, 3),
+                    "max": round(values[-1] * 1000, 3),
+                },
+                # Only MongoDB emits command events; the in-memory stand-in reports 0
+                "db_commands_per_request": round(self.db_commands[op] / len(values), 2),
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            "requests": total,
+            "wall_seconds": round(wall_seconds, 3),
+            "throughput_rps": round(total / wall_seconds, 2) if wall_seconds else None,
+            "operations": operations,
+        }
+
+
+async def run_workers(concurrency: int, total: int, work: Callable[[int], Awaitable[None]]) -> float:
+    """Run `work(i)` for i in range(total) on `concurrency` workers; returns wall seconds"""
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            await work(i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return time.perf_counter() - started
+
+
+def bearer(user_id: str) -> dict:
+    return {"Authorization": "Bearer " + auth.create_access_token({"sub": user_id, "role": "customer"})}
+
+
+# -------------------------
+# Scenarios
+# -------------------------
+async def scenario_browse(client: httpx.AsyncClient, data: dict, args) -> dict:
+    """Anonymous catalog traffic: product lists, product pages, vendors and a vendor's products"""
+    recorder = Recorder()
+    products = data["product_ids"]
+    vendor_id = data["vendor_id"]
+
+    async def work(i: int):
+        step = i % 4
+        if step == 0:
+            await recorder.call("list_products", lambda: client.get("/api/store/products", params={"limit": 20}))
+        elif step == 1:
+            product_id = products[i % len(products)]
+            await recorder.call("get_product", lambda: client.get(f"/api/store/products/{product_id}"))
+        elif step == 2:
+            await recorder.call("list_vendors", lambda: client.get("/api/store/vendors"))
+        else:
+            await recorder.call("vendor_products", lambda: client.get(f"/api/store/vendors/{vendor_id}/products"))
+
+    wall = await run_workers(args.concurrency, args.requests, work)
+    return recorder.summary(wall)
+
+
+async def scenario_login(client: httpx.AsyncClient, data: dict, args) -> dict:
+    """Password logins; dominated by bcrypt (BCRYPT_ROUNDS) and the hashing pool"""
+    recorder = Recorder()
+    emails = data["customer_emails"]
+
+    async def work(i: int):
+        body = {"email": emails[i % len(emails)], "password": PASSWORD}
+        await recorder.call("login", lambda: client.post("/api/users/login", json=body))
+
+    wall = await run_workers(args.concurrency, args.login_requests, work)
+    return recorder.summary(wall)
+
+
+async def scenario_order_contention(client: httpx.AsyncClient, data: dict, args) -> dict:
+    """
+    Every customer orders the same product at once. More orders are sent
+    than there is stock, so the tail must fail with "Not enough stock" and
+    the final stock must equal the initial stock minus what was sold.
+    """
+    recorder = Recorder()
+    customers = data["customer_ids"]
+    product_id = data["contended_product_id"]
+    headers = {c: bearer(c) for c in customers}
+
+    async def work(i: int):
+        body = {"product_id": product_id, "quantity": 1, "payment_method": "cod"}
+        customer = customers[i % len(customers)]
+        await recorder.call("place_order", lambda: client.post("/api/store/orders", json=body, headers=headers[customer]))
+
+    wall = await run_workers(args.concurrency, args.order_requests, work)
+    report = recorder.summary(wall)
+
+    db = database.db
+    product = await db["products"].find_one({"_id": ObjectId(product_id)}, {"stock": 1})
+    sold = await db["orders"].count_documents({"product_id": product_id})
+    report["consistency"] = {
+        "initial_stock": args.contention_stock,
+        "orders_accepted": recorder.statuses["place_order"].get(200, 0),
+        "orders_stored": sold,
+        "final_stock": product["stock"],
+        "ok": product["stock"] == args.contention_stock - sold and product["stock"] >= 0,
+    }
+    return report
+
+
+async def scenario_upi_confirm(client: httpx.AsyncClient, data: dict, args) -> dict:
+    """Each iteration places a UPI order and confirms its payment"""
+    recorder = Recorder()
+    customers = data["customer_ids"]
+    products = data["product_ids"]
+    headers = {c: bearer(c) for c in customers}
+
+    async def work(i: int):
+        customer = headers[customers[i % len(customers)]]
+        body = {"product_id": products[i % len(products)], "quantity": 1, "payment_method": "upi"}
+        response = await recorder.call("place_upi_order", lambda: client.post("/api/store/orders", json=body, headers=customer))
+        if response is None or response.status_code != 200:
+            return
+        order = response.json()
+        order_id = order["id"]
+        payment = {"order_id": order_id, "amount": order["total"], "transaction_id": f"TXN{i}"}
+        await recorder.call(
+            "confirm_payment",
+            lambda: client.post(f"/api/store/orders/{order_id}/confirm-payment", json=payment, headers=customer)
+        )
+
+    wall = await run_workers(args.concurrency, args.upi_requests, work)
+    return recorder.summary(wall)
+
+
+SCENARIO_FUNCS = {
+    "browse": scenario_browse,
+    "login": scenario_login,
+    "order_contention": scenario_order_contention,
+    "upi_confirm": scenario_upi_confirm,
+}
+
+
+# -------------------------
+# Entry point
+# -------------------------
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def main(args) -> dict:
+    twilio = install_stubs()
+    backend = await connect(args.mongo_url, args.mongo_db)
+    data = await seed(database.db, args.customers, args.products, args.contention_stock)
+    await start_notification_workers(database.db)
+
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            # One untimed request so first-call setup does not land in any percentile
+            await client.get("/health")
+            for name in args.scenarios:
+                results[name] = await SCENARIO_FUNCS[name](client, data, args)
+    finally:
+        await stop_notification_workers()
+        if args.mongo_url:
+            database.client.close()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "backend": backend,
+        "config": {
+            "concurrency": args.concurrency,
+            "customers": args.customers,
+            "products": args.products,
+            "bcrypt_rounds": auth.BCRYPT_ROUNDS,
+        },
+        "scenarios": results,
+        "whatsapp_messages_stubbed": twilio.messages.sent,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the store API in-process")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent simulated clients")
+    parser.add_argument("--requests", type=int, default=2000, help="catalog requests in the browse scenario")
+    parser.add_argument("--login-requests", type=int, default=100)
+    parser.add_argument("--order-requests", type=int, default=500, help="orders sent for the contended product")
+    parser.add_argument("--contention-stock", type=int, default=200, help="stock of the contended product")
+    parser.add_argument("--upi-requests", type=int, default=300, help="UPI orders placed and confirmed")
+    parser.add_argument("--customers", type=int, default=50)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--mongo-url", help="use this MongoDB instead of the in-memory stand-in")
+    parser.add_argument("--mongo-db", default="virtual_store_loadtest", help="database to (re)create for the run")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    rendered = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(rendered + "\n")
+    print(rendered)